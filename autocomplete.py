@@ -0,0 +1,219 @@
+import bisect
+import collections
+import itertools
+import threading
+
+from cache import TTLCache
+
+# ============================
+# SETTINGS
+# ============================
+MAX_CHOICES = 25  # Discord shows at most 25 autocomplete choices
+MAX_CHOICE_LENGTH = 100  # ...each at most 100 characters
+RECENT_TAGS_PER_GUILD = 25
+RECENT_TAGS_TTL = 7 * 24 * 3600  # forget a guild's recent tags after a quiet week
+RECENT_TAGS_MAX_GUILDS = 10_000
+FUZZY_MIN_SCORE = 0.25  # trigram similarity worth suggesting
+FUZZY_AUTO_RESOLVE_SCORE = 0.55  # ...and worth using without asking
+FUZZY_AUTO_RESOLVE_MARGIN = 0.15  # required lead over the runner-up to auto-resolve
+FUZZY_MAX_POSTINGS = 2000  # trigrams shared by more names than this are too common to search by
+
+
+# ============================
+# REGISTERED NAMES
+# ============================
+class PrefixIndex:
+    """Sorted keys answering prefix queries with bisect: O(log n + k) per query"""
+
+    def __init__(self, items=None):
+        self._values = dict(items or {})
+        self._keys = sorted(self._values)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def add(self, key, value):
+        with self._lock:
+            if key not in self._values:
+                bisect.insort(self._keys, key)
+            self._values[key] = value
+
+    def remove(self, key):
+        with self._lock:
+            if key not in self._values:
+                return False
+            del self._values[key]
+            del self._keys[bisect.bisect_left(self._keys, key)]
+            return True
+
+    def search(self, prefix, limit=MAX_CHOICES):
+        """Return up to limit (key, value) pairs whose key starts with prefix, in key order"""
+        results = []
+        with self._lock:
+            index = bisect.bisect_left(self._keys, prefix)
+            while index < len(self._keys) and len(results) < limit:
+                key = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                results.append((key, self._values[key]))
+                index += 1
+        return results
+
+
+# ============================
+# TYPO-TOLERANT NAMES
+# ============================
+def trigrams(text):
+    """Padded character trigrams, so short names and word starts still match"""
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """Trigram postings over names for typo-tolerant lookup; add/remove cost O(name length)"""
+
+    def __init__(self, names=()):
+        self._postings = collections.defaultdict(set)
+        self._trigrams = {}
+        self._lock = threading.Lock()
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        with self._lock:
+            if name in self._trigrams:
+                return
+            grams = trigrams(name)
+            self._trigrams[name] = grams
+            for gram in grams:
+                self._postings[gram].add(name)
+
+    def remove(self, name):
+        with self._lock:
+            grams = self._trigrams.pop(name, None)
+            for gram in grams or ():
+                posting = self._postings[gram]
+                posting.discard(name)
+                if not posting:
+                    del self._postings[gram]
+
+    def similar(self, name, limit=3, min_score=FUZZY_MIN_SCORE):
+        """Return up to limit (name, score) pairs by trigram Jaccard similarity, best first"""
+        grams = trigrams(name)
+        scored = []
+        with self._lock:
+            postings = sorted((self._postings[g] for g in grams if g in self._postings), key=len)
+            if not postings:
+                return []
+            # Candidates come from the selective trigrams; if every trigram is common,
+            # a bounded slice of the rarest one keeps the worst case cheap
+            selective = [p for p in postings if len(p) <= FUZZY_MAX_POSTINGS]
+            candidates = set().union(*selective) if selective else set(itertools.islice(postings[0], FUZZY_MAX_POSTINGS))
+            for candidate in candidates:
+                other = self._trigrams[candidate]
+                shared = len(grams & other)
+                score = shared / (len(grams) + len(other) - shared)
+                if score >= min_score:
+                    scored.append((candidate, score))
+        scored.sort(key=lambda match: (-match[1], match[0]))
+        return scored[:limit]
+
+
+class RegistrationIndex:
+    """Registered usernames → tags, with prefix search for autocomplete and trigram search for typos"""
+
+    def __init__(self, registrations=None):
+        registrations = registrations or {}
+        self._prefix = PrefixIndex(registrations)
+        self._trigrams = TrigramIndex(registrations)
+
+    def __len__(self):
+        return len(self._prefix)
+
+    def get(self, username):
+        return self._prefix.get(username)
+
+    def add(self, username, tag):
+        self._prefix.add(username, tag)
+        self._trigrams.add(username)
+
+    def remove(self, username):
+        self._trigrams.remove(username)
+        return self._prefix.remove(username)
+
+    def search(self, prefix, limit=MAX_CHOICES):
+        return self._prefix.search(prefix, limit)
+
+    def similar(self, username, limit=3):
+        """Return up to limit (username, tag, score) for registered names close to username"""
+        matches = []
+        for name, score in self._trigrams.similar(username, limit):
+            tag = self._prefix.get(name)
+            if tag is not None:
+                matches.append((name, tag, score))
+        return matches
+
+
+def confident_match(matches):
+    """The tag of the one similar() match good enough to use without asking, or None"""
+    if not matches or matches[0][2] < FUZZY_AUTO_RESOLVE_SCORE:
+        return None
+    if len(matches) > 1 and matches[0][2] - matches[1][2] < FUZZY_AUTO_RESOLVE_MARGIN:
+        return None
+    return matches[0][1]
+
+
+# ============================
+# RECENTLY LOOKED-UP TAGS
+# ============================
+class RecentTags:
+    """The last few tags looked up in each guild, newest first"""
+
+    def __init__(self, per_guild=RECENT_TAGS_PER_GUILD):
+        self.per_guild = per_guild
+        self._guilds = TTLCache(ttl=RECENT_TAGS_TTL, max_entries=RECENT_TAGS_MAX_GUILDS)
+
+    def add(self, guild_id, tag, name):
+        recent = self._guilds.get(guild_id)
+        if recent is None:
+            recent = collections.OrderedDict()
+        recent[tag] = name
+        recent.move_to_end(tag)
+        while len(recent) > self.per_guild:
+            recent.popitem(last=False)
+        self._guilds.set(guild_id, recent)  # also refreshes the guild's TTL
+
+    def search(self, guild_id, prefix, limit=MAX_CHOICES):
+        """Return up to limit (tag, name) pairs whose tag or name starts with prefix"""
+        recent = self._guilds.get(guild_id)
+        if not recent:
+            return []
+        tag_prefix = prefix.lstrip("#").upper()
+        results = []
+        for tag, name in reversed(list(recent.items())):
+            if tag.lstrip("#").startswith(tag_prefix) or name.lower().startswith(prefix):
+                results.append((tag, name))
+                if len(results) == limit:
+                    break
+        return results
+
+
+def player_suggestions(names, recent, current, guild_id, limit=MAX_CHOICES):
+    """(label, value) pairs for a player parameter: registered usernames first,
+    then tags recently looked up in this guild that aren't already listed"""
+    prefix = current.strip().lower()
+    suggestions = []
+    shown = set()
+    for username, tag in names.search(prefix, limit):
+        suggestions.append((f"{username} ({tag})"[:MAX_CHOICE_LENGTH], username))
+        shown.add(tag)
+    if guild_id is not None and len(suggestions) < limit:
+        for tag, name in recent.search(guild_id, prefix, limit - len(suggestions)):
+            if tag not in shown:
+                suggestions.append((f"{name} ({tag})"[:MAX_CHOICE_LENGTH], tag))
+    return suggestions[:limit]
@@ -0,0 +1,189 @@
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Run from anywhere: the game modules live one directory up
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import clash_royale
+import brawl_stars
+import fortnite
+
+# ============================
+# SETTINGS
+# ============================
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+# ops/sec only mean something on the machine that measured them, so the
+# baseline is local: save it before a change, then --compare after it
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+SIZES = ("small", "typical", "huge")
+REGISTRATION_COUNTS = (10, 1_000, 100_000)
+
+MIN_TIME = 0.2  # seconds each sample runs for
+MIN_ROUNDS = 5
+REPEATS = 5  # samples per benchmark; the median is reported
+DEFAULT_TOLERANCE = 0.25  # allowed ops/sec drop before --compare fails
+
+
+def load_fixture(game, size):
+    """Load a recorded API response from benchmarks/fixtures"""
+    with open(os.path.join(FIXTURES_DIR, f"{game}_{size}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ============================
+# BENCHMARKS
+# ============================
+def embed_benchmarks():
+    """(name, func) pairs for every embed builder, comparison and win probability"""
+    for size in SIZES:
+        cr = load_fixture("clash_royale", size)
+        bs = load_fixture("brawl_stars", size)
+        fn = load_fixture("fortnite", size)
+        fn_overall = fn["data"]["stats"]["all"]["overall"]
+
+        yield f"build_clash_royale_embed[{size}]", lambda cr=cr: clash_royale.build_clash_royale_embed(cr)
+        yield f"build_brawl_stars_embed[{size}]", lambda bs=bs: brawl_stars.build_brawl_stars_embed(bs)
+        yield f"build_fortnite_embed[{size}]", lambda fn=fn: fortnite.build_fortnite_embed(fn, season_data=fn, show_inputs=True)
+        yield f"build_clash_comparison_embed[{size}]", lambda cr=cr: clash_royale.build_clash_comparison_embed(cr, cr)
+        yield f"build_brawl_stars_comparison_embed[{size}]", lambda bs=bs: brawl_stars.build_brawl_stars_comparison_embed(bs, bs)
+        yield f"build_fortnite_comparison_embed[{size}]", lambda fn=fn: fortnite.build_fortnite_comparison_embed(fn, fn, "Epic", "PSN")
+        yield f"calculate_win_probability[{size}]", lambda o=fn_overall: fortnite.calculate_win_probability(o, o)
+
+
+def registration_benchmarks(work_dir):
+    """(name, func) pairs for register/lookup/autocomplete against stores of REGISTRATION_COUNTS entries"""
+    tags = ["#" + "".join("0289PYLQGRJCUV"[(i >> (4 * d)) % 14] for d in range(8)) for i in range(max(REGISTRATION_COUNTS))]
+    for count in REGISTRATION_COUNTS:
+        path = os.path.join(work_dir, f"registrations_{count}.json")
+        with open(path, "w") as f:
+            json.dump({f"user{i}": tags[i] for i in range(count)}, f)
+
+        def use_store(path=path):
+            if clash_royale.REGISTRATION_FILE != path:
+                clash_royale.REGISTRATION_FILE = path
+                clash_royale._registration_index = None  # rebuilt from the new store on first use
+
+        def register(counter=itertools.count(), path=path, count=count):
+            use_store(path)
+            # New names each call so the store grows like real sign-ups would
+            clash_royale.register_player(f"bench{next(counter)}", tags[count - 1])
+
+        def lookup(path=path, count=count):
+            use_store(path)
+            clash_royale.get_player_tag(f"user{count // 2}")
+
+        def suggest(path=path, count=count):
+            use_store(path)
+            clash_royale.player_suggestions(f"user{count // 3}"[:6], guild_id=1)
+
+        yield f"register_player[{count}]", register
+        yield f"get_player_tag[{count}]", lookup
+        yield f"player_suggestions[{count}]", suggest
+
+
+# ============================
+# MEASUREMENT
+# ============================
+def measure_ops(func, repeats=REPEATS):
+    """Return the median operations per second of `repeats` samples,
+    each running for at least MIN_TIME and MIN_ROUNDS"""
+    samples = []
+    for _ in range(repeats):
+        rounds = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while rounds < MIN_ROUNDS or elapsed < MIN_TIME:
+            func()
+            rounds += 1
+            elapsed = time.perf_counter() - start
+        samples.append(rounds / elapsed)
+    return statistics.median(samples)
+
+
+def measure_peak_memory(func):
+    """Return peak bytes allocated by one call"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(name_filter=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        benchmarks = list(embed_benchmarks()) + list(registration_benchmarks(work_dir))
+        for name, func in benchmarks:
+            if name_filter and name_filter not in name:
+                continue
+            func()  # warm-up
+            results[name] = {
+                "ops_per_sec": round(measure_ops(func), 2),
+                "peak_memory_kb": round(measure_peak_memory(func) / 1024, 1),
+            }
+            print(f"{name:48} {results[name]['ops_per_sec']:>12,.1f} ops/s {results[name]['peak_memory_kb']:>10,.1f} KB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the names of benchmarks that got slower than baseline allows"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]["ops_per_sec"]
+        if result["ops_per_sec"] < expected * (1 - tolerance):
+            change = (result["ops_per_sec"] / expected - 1) * 100
+            print(f"❌ REGRESSION {name}: {result['ops_per_sec']:,.1f} ops/s vs baseline {expected:,.1f} ({change:+.0f}%)")
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for embed builders, comparisons and registrations")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write results to {os.path.basename(BASELINE_FILE)} (local to this machine)")
+    parser.add_argument("--compare", action="store_true", help="Fail if any benchmark is slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown for --compare (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print("⏱️ BENCHMARKS")
+    print(f"{'='*60}\n")
+    results = run(args.filter)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, "r") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\n💾 Saved baseline to: {BASELINE_FILE}")
+
+    if args.compare:
+        if not os.path.exists(BASELINE_FILE):
+            print("❌ No baseline found. Run with --save-baseline on this machine first.")
+            return 1
+        with open(BASELINE_FILE, "r") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
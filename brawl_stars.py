@@ -1,36 +1,179 @@
-import requests
 import urllib.parse
 import discord
 import json
 import os
 
+import autocomplete
+import cassette
+import http_cache
+import metrics
+import quotas
+import reference_data
+import scheduler
+import tracing
+from cache import TTLCache
+from supercell import InvalidTagError, canonicalize_tag
+
 # ============================
 # BRAWL STARS API
 # ============================
-BRAWL_STARS_BASE = "https://api.brawlstars.com/v1"
+# Overridable so load tests can point at a local stub server
+BRAWL_STARS_BASE = os.getenv("BRAWL_STARS_API_BASE", "https://api.brawlstars.com/v1")
+
+# Unknown/invalid tags are remembered briefly so retrying a typo doesn't
+# spend another request. Transient errors (5xx, 429, timeouts) are never cached.
+NOT_FOUND_CACHE_TTL = 120  # seconds
+NEGATIVE_STATUS_CODES = (400, 404)
+
+_not_found_cache = TTLCache(ttl=NOT_FOUND_CACHE_TTL, max_entries=4096, name="bs_not_found")
+_last_good = http_cache.LastGood(name="bs_last_good")
 
 def brawl_stars_api_get(path, api_key):
     """Helper to make GET requests to Brawl Stars API"""
+    if _not_found_cache.get(path) is not None:
+        return None
+    url = f"{BRAWL_STARS_BASE}{path}"
     try:
-        r = requests.get(
-            f"{BRAWL_STARS_BASE}{path}",
-            headers={"Authorization": f"Bearer {api_key}"},
-            timeout=10
-        )
+        cached = http_cache.fresh(url)
+        if cached is not None:
+            return cached.json()
+        quotas.note_upstream_call()
+        headers, revalidated = http_cache.conditional_headers(url, headers={"Authorization": f"Bearer {api_key}"})
+        with scheduler.upstream_slot("brawl_stars"), metrics.track_upstream("brawl_stars") as call:
+            r = cassette.get(
+                url,
+                headers=headers,
+                timeout=10
+            )
+            call.status = r.status_code
+        # Honors Cache-Control max-age; a 304 hands back the cached response
+        r = http_cache.update(url, None, r, revalidated)
+        if r.status_code in NEGATIVE_STATUS_CODES:
+            print("BRAWL STARS API ERROR:", r.status_code, r.text)
+            _not_found_cache.set(path, r.status_code)
+            return None
         if r.status_code != 200:
             print("BRAWL STARS API ERROR:", r.status_code, r.text)
             return None
+        _last_good.remember(url, None, r)
         return r.json()
+    except scheduler.Cancelled:
+        return None
     except Exception as e:
         print("BRAWL STARS REQUEST ERROR:", e)
         return None
 
 
+@metrics.timed_phase("fetch")
+@tracing.traced
 def fetch_brawl_stars_stats(player_tag, api_key):
     """Fetch Brawl Stars player stats. Player tag must include #"""
     # URL encode the player tag (e.g., #Q8YYOJU becomes %23Q8YYOJU)
     encoded_tag = urllib.parse.quote(player_tag)
-    return brawl_stars_api_get(f"/players/{encoded_tag}", api_key)
+    data = brawl_stars_api_get(f"/players/{encoded_tag}", api_key)
+    if data:
+        # Background polls count too, so a raised power cap is noticed early
+        brawler_max_power(data.get("brawlers", ()))
+    return data
+
+
+def player_not_found(player_tag):
+    """True if the API recently answered that this player doesn't exist, as opposed
+    to a failed request (rate limit, outage, timeout) that is worth retrying"""
+    return _not_found_cache.get(f"/players/{urllib.parse.quote(player_tag)}") is not None
+
+
+def cached_brawl_stars_stats(player_tag):
+    """(stats, age in seconds) from the last API response for this player, however old, or None"""
+    return _last_good.get(f"{BRAWL_STARS_BASE}/players/{urllib.parse.quote(player_tag)}")
+
+
+# ============================
+# CLUBS
+# ============================
+CLUB_CACHE_TTL = 300  # seconds
+CLUB_MEMBERS_PER_PAGE = 10
+
+_club_cache = TTLCache(ttl=CLUB_CACHE_TTL, max_entries=256, name="bs_clubs")
+
+@metrics.timed_phase("fetch")
+@tracing.traced
+def fetch_brawl_stars_club(club_tag, api_key):
+    """Fetch a Brawl Stars club with its member roster. Club tag must include #
+
+    Results are cached per club for CLUB_CACHE_TTL seconds. The roster comes
+    from the club payload when present, otherwise from /clubs/{tag}/members.
+    """
+    cached = _club_cache.get(club_tag)
+    if cached is not None:
+        return cached
+    
+    encoded_tag = urllib.parse.quote(club_tag)
+    club = brawl_stars_api_get(f"/clubs/{encoded_tag}", api_key)
+    if not club:
+        return None
+    
+    if not club.get("members"):
+        members = brawl_stars_api_get(f"/clubs/{encoded_tag}/members", api_key)
+        club["members"] = members.get("items", []) if members else []
+    
+    _prepare_club(club)
+    _club_cache.set(club_tag, club)
+    return club
+
+
+def _prepare_club(club):
+    # Sort once here so every page view can slice without re-sorting
+    club["members"] = sorted(club["members"], key=lambda m: m.get("trophies", 0), reverse=True)
+    club["stats"] = compute_club_stats(club["members"])
+
+
+def cached_brawl_stars_club(club_tag):
+    """(club with roster, age in seconds) from the last API responses for this club, however old, or None"""
+    encoded_tag = urllib.parse.quote(club_tag)
+    cached = _last_good.get(f"{BRAWL_STARS_BASE}/clubs/{encoded_tag}")
+    if cached is None:
+        return None
+    club, age = cached
+    if not club.get("members"):
+        cached = _last_good.get(f"{BRAWL_STARS_BASE}/clubs/{encoded_tag}/members")
+        if cached is None:
+            return None
+        members, members_age = cached
+        club["members"] = members.get("items", [])
+        age = max(age, members_age)
+    _prepare_club(club)
+    return club, age
+
+
+def compute_club_stats(members):
+    """Compute club-wide trophy stats in a single pass over members sorted by trophies"""
+    count = len(members)
+    total = 0
+    roles = {}
+    for member in members:
+        total += member.get("trophies", 0)
+        role = member.get("role", "member")
+        roles[role] = roles.get(role, 0) + 1
+    
+    if count == 0:
+        return {"count": 0, "total": 0, "average": 0, "median": 0, "highest": 0, "lowest": 0, "roles": roles}
+    
+    middle = count // 2
+    if count % 2:
+        median = members[middle].get("trophies", 0)
+    else:
+        median = (members[middle - 1].get("trophies", 0) + members[middle].get("trophies", 0)) // 2
+    
+    return {
+        "count": count,
+        "total": total,
+        "average": total // count,
+        "median": median,
+        "highest": members[0].get("trophies", 0),
+        "lowest": members[-1].get("trophies", 0),
+        "roles": roles,
+    }
 
 
 # ============================
@@ -50,37 +193,151 @@ def load_registrations():
 
 def save_registrations(registrations):
     """Save registered players to file"""
-    with open(REGISTRATION_FILE, 'w') as f:
+    # Written whole and swapped in, so a crash mid-write never loses registrations
+    tmp_path = REGISTRATION_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
         json.dump(registrations, f, indent=2)
+    os.replace(tmp_path, REGISTRATION_FILE)
 
 def register_player(username, player_tag):
     """Register a username with their player tag"""
     registrations = load_registrations()
-    # Ensure tag starts with #
-    if not player_tag.startswith("#"):
-        player_tag = "#" + player_tag
+    player_tag = canonicalize_tag(player_tag)
     registrations[username.lower()] = player_tag
     save_registrations(registrations)
+    registration_index().add(username.lower(), player_tag)
     return player_tag
 
-def get_player_tag(username):
-    """Get player tag from registered username"""
+def register_players(entries, overwrite=False, own_tags=None):
+    """Register many username → canonical tag entries with a single save.
+    overwrite replaces usernames registered to another tag, but only tags in
+    own_tags when it's given. Returns (saved, skipped): skipped usernames were
+    already registered to another tag and kept."""
     registrations = load_registrations()
-    return registrations.get(username.lower())
+    saved = {}
+    skipped = []
+    for username, player_tag in entries.items():
+        username = username.lower()
+        current = registrations.get(username, player_tag)
+        if current != player_tag and not (overwrite and (own_tags is None or current in own_tags)):
+            skipped.append(username)
+            continue
+        saved[username] = player_tag
+    registrations.update(saved)
+    save_registrations(registrations)
+    index = registration_index()
+    for username, player_tag in saved.items():
+        index.add(username, player_tag)
+    return saved, skipped
+
+@tracing.traced
+def get_player_tag(username):
+    """Get player tag from registered username, tolerating small typos.
+    Input that is itself a valid tag is only matched exactly, never fuzzily."""
+    username = username.strip().lower()
+    index = registration_index()
+    tag = index.get(username)
+    if tag is not None or username.startswith("#"):
+        return tag
+    try:
+        canonicalize_tag(username)
+        return None
+    except InvalidTagError:
+        # Resolved locally, before a typo can turn into a failed API call
+        return autocomplete.confident_match(index.similar(username))
+
+def resolve_player_tag(player):
+    """Resolve a registered username or a raw player tag to a canonical tag.
+    Raises InvalidTagError if player is neither, naming any close registered usernames."""
+    tag = get_player_tag(player)
+    if tag:
+        return tag
+    try:
+        return canonicalize_tag(player)
+    except InvalidTagError as e:
+        matches = registration_index().similar(player.strip().lower())
+        if not matches:
+            raise
+        names = ", ".join(f"`{name}`" for name, _, _ in matches)
+        raise InvalidTagError(f"{e}\nDid you mean {names}?") from None
 
 def unregister_player(username):
-    """Remove a registered player"""
+    """Remove a registered player; returns the tag they were registered to, or None"""
     registrations = load_registrations()
     if username.lower() in registrations:
-        del registrations[username.lower()]
+        player_tag = registrations.pop(username.lower())
         save_registrations(registrations)
-        return True
-    return False
+        registration_index().remove(username.lower())
+        return player_tag
+    return None
+
+
+# ============================
+# AUTOCOMPLETE
+# ============================
+_registration_index = None
+_recent_tags = autocomplete.RecentTags()
+
+def registration_index():
+    """In-memory index over registered usernames (exact, prefix and fuzzy), built on first use"""
+    global _registration_index
+    if _registration_index is None:
+        _registration_index = autocomplete.RegistrationIndex(load_registrations())
+    return _registration_index
+
+def remember_lookup(guild_id, data):
+    """Offer a successfully looked-up player in this guild's autocomplete"""
+    if guild_id is not None and data.get("tag"):
+        _recent_tags.add(guild_id, data["tag"], data.get("name", "Unknown"))
+
+def player_suggestions(current, guild_id=None):
+    """(label, value) autocomplete choices for a player parameter"""
+    return autocomplete.player_suggestions(registration_index(), _recent_tags, current, guild_id)
+
+
+# ============================
+# REFERENCE DATA
+# ============================
+brawlers_catalog = reference_data.Catalog("brawl_stars_brawlers")
+
+# The /brawlers catalog lists star powers and gadgets but not power caps, so the
+# cap is the highest power any player profile has shown, starting from the last
+# known one. A game update that raises it is picked up from the first maxed brawler.
+BRAWLER_MAX_POWER = 11
+_max_power_seen = BRAWLER_MAX_POWER
+
+def refresh_reference_data(api_key):
+    """Load the brawler catalog, re-fetching /brawlers if the stored copy is over a day old"""
+    brawlers_catalog.refresh(lambda: (brawl_stars_api_get("/brawlers", api_key) or {}).get("items"))
+
+def brawler_max_power(brawlers=()):
+    """The brawler power cap, raised if any of these brawlers is above it"""
+    global _max_power_seen
+    highest = max((b.get("power", 0) for b in brawlers), default=0)
+    if highest > _max_power_seen:
+        _max_power_seen = highest
+    return _max_power_seen
+
+def _of_catalog(count, total):
+    return f"{count}/{total}" if total else f"{count}"
+
+
+# ============================
+# STARTUP
+# ============================
+def warm_up(api_key=None):
+    """Open a pooled API connection, index the registrations and load reference data before the first command"""
+    cassette.warm_up(BRAWL_STARS_BASE)
+    registration_index()
+    if api_key:
+        refresh_reference_data(api_key)
 
 
 # ============================
 # EMBED BUILDERS
 # ============================
+@metrics.timed_phase("render")
+@tracing.traced
 def build_brawl_stars_embed(data):
     """Build embed for Brawl Stars player stats"""
     
@@ -111,7 +368,8 @@ def build_brawl_stars_embed(data):
     top_brawlers = sorted_brawlers[:5]
     
     # Calculate power level stats
-    max_power_brawlers = len([b for b in brawlers if b.get("power", 0) == 11])
+    max_power = brawler_max_power(brawlers)
+    max_power_brawlers = len([b for b in brawlers if b.get("power", 0) >= max_power])
     
     # Create embed
     embed = discord.Embed(
@@ -147,8 +405,8 @@ def build_brawl_stars_embed(data):
     embed.add_field(
         name="🎮 BRAWLERS",
         value=(
-            f"**Unlocked:** {total_brawlers}\n"
-            f"**Power 11:** {max_power_brawlers}\n"
+            f"**Unlocked:** {_of_catalog(total_brawlers, len(brawlers_catalog))}\n"
+            f"**Power {max_power}:** {max_power_brawlers}\n"
             f"**Club:** {club_info}"
         ),
         inline=True
@@ -185,8 +443,10 @@ def build_brawl_stars_embed(data):
     total_gears = sum(len(b.get("gears", [])) for b in brawlers)
     
     if total_star_powers > 0 or total_gadgets > 0 or total_gears > 0:
-        fun_stats.append(f"⭐ Star Powers: **{total_star_powers}**")
-        fun_stats.append(f"🔧 Gadgets: **{total_gadgets}**")
+        all_star_powers = sum(len(b.get("starPowers", [])) for b in brawlers_catalog.values())
+        all_gadgets = sum(len(b.get("gadgets", [])) for b in brawlers_catalog.values())
+        fun_stats.append(f"⭐ Star Powers: **{_of_catalog(total_star_powers, all_star_powers)}**")
+        fun_stats.append(f"🔧 Gadgets: **{_of_catalog(total_gadgets, all_gadgets)}**")
         if total_gears > 0:
             fun_stats.append(f"⚙️ Gears: **{total_gears}**")
     
@@ -202,28 +462,23 @@ def build_brawl_stars_embed(data):
     return embed
 
 
-def build_brawl_stars_comparison_embed(data1, data2):
-    """Build a comparison embed for two Brawl Stars players"""
-    
-    # Extract player info
-    name1 = data1.get("name", "Player 1")
-    name2 = data2.get("name", "Player 2")
-    
-    # Trophy stats
+def digest_entry(data):
+    """The stats a guild digest compares from one day to the next"""
+    return {"name": data.get("name", "Unknown"), "trophies": data.get("trophies", 0), "best": data.get("highestTrophies", 0)}
+
+def watch_entry(data):
+    """What /watch polls compare: trophies for milestones, XP for activity"""
+    return {"name": data.get("name", "Unknown"), "trophies": data.get("trophies", 0), "activity": data.get("expPoints", 0)}
+
+def calculate_win_probability(data1, data2):
+    """Calculate (player 1 %, player 2 %) win chances from trophies 60%, victories 30%, brawlers 10%"""
     trophies1 = data1.get("trophies", 0)
     trophies2 = data2.get("trophies", 0)
-    highest1 = data1.get("highestTrophies", 0)
-    highest2 = data2.get("highestTrophies", 0)
-    
-    # Victory stats
     total_victories1 = data1.get("soloVictories", 0) + data1.get("duoVictories", 0) + data1.get("3vs3Victories", 0)
     total_victories2 = data2.get("soloVictories", 0) + data2.get("duoVictories", 0) + data2.get("3vs3Victories", 0)
-    
-    # Brawler stats
     brawlers1 = len(data1.get("brawlers", []))
     brawlers2 = len(data2.get("brawlers", []))
     
-    # Calculate win probability (based on trophies 60%, victories 30%, brawlers 10%)
     trophy_score1 = (trophies1 / (trophies1 + trophies2) * 60) if (trophies1 + trophies2) > 0 else 30
     trophy_score2 = (trophies2 / (trophies1 + trophies2) * 60) if (trophies1 + trophies2) > 0 else 30
     
@@ -238,6 +493,33 @@ def build_brawl_stars_comparison_embed(data1, data2):
     
     p1_chance = round((total1 / (total1 + total2) * 100), 1)
     p2_chance = round((total2 / (total1 + total2) * 100), 1)
+    return p1_chance, p2_chance
+
+
+@metrics.timed_phase("render")
+@tracing.traced
+def build_brawl_stars_comparison_embed(data1, data2):
+    """Build a comparison embed for two Brawl Stars players"""
+    
+    # Extract player info
+    name1 = data1.get("name", "Player 1")
+    name2 = data2.get("name", "Player 2")
+    
+    # Trophy stats
+    trophies1 = data1.get("trophies", 0)
+    trophies2 = data2.get("trophies", 0)
+    highest1 = data1.get("highestTrophies", 0)
+    highest2 = data2.get("highestTrophies", 0)
+    
+    # Victory stats
+    total_victories1 = data1.get("soloVictories", 0) + data1.get("duoVictories", 0) + data1.get("3vs3Victories", 0)
+    total_victories2 = data2.get("soloVictories", 0) + data2.get("duoVictories", 0) + data2.get("3vs3Victories", 0)
+    
+    # Brawler stats
+    brawlers1 = len(data1.get("brawlers", []))
+    brawlers2 = len(data2.get("brawlers", []))
+    
+    p1_chance, p2_chance = calculate_win_probability(data1, data2)
     
     # Determine winner
     if p1_chance > p2_chance:
@@ -320,6 +602,163 @@ def build_brawl_stars_comparison_embed(data1, data2):
     return embed
 
 
+@metrics.timed_phase("render")
+@tracing.traced
+def build_brawl_stars_club_embed(club, page=0):
+    """Build embed for one page of a Brawl Stars club roster"""
+    
+    name = club.get("name", "Unknown Club")
+    tag = club.get("tag", "")
+    members = club.get("members", [])
+    stats = club.get("stats") or compute_club_stats(members)
+    
+    page_count = max(1, -(-len(members) // CLUB_MEMBERS_PER_PAGE))
+    page = max(0, min(page, page_count - 1))
+    
+    embed = discord.Embed(
+        title=f"🛡️ {name}",
+        description=club.get("description") or None,
+        color=discord.Color.gold()
+    )
+    
+    # Club overview
+    embed.add_field(
+        name="🏆 CLUB TROPHIES",
+        value=(
+            f"**Total:** {club.get('trophies', stats['total']):,}\n"
+            f"**Required:** {club.get('requiredTrophies', 0):,}\n"
+            f"**Type:** {club.get('type', 'unknown').title()}"
+        ),
+        inline=True
+    )
+    
+    # Member trophy stats
+    embed.add_field(
+        name="📊 MEMBER STATS",
+        value=(
+            f"**Members:** {stats['count']}/30\n"
+            f"**Average:** {stats['average']:,}\n"
+            f"**Median:** {stats['median']:,}\n"
+            f"**Range:** {stats['lowest']:,} – {stats['highest']:,}"
+        ),
+        inline=True
+    )
+    
+    roles = stats["roles"]
+    embed.add_field(
+        name="👥 ROLES",
+        value=(
+            f"**President:** {roles.get('president', 0)}\n"
+            f"**Vice Presidents:** {roles.get('vicePresident', 0)}\n"
+            f"**Seniors:** {roles.get('senior', 0)}\n"
+            f"**Members:** {roles.get('member', 0)}"
+        ),
+        inline=True
+    )
+    
+    # Roster page
+    start = page * CLUB_MEMBERS_PER_PAGE
+    page_members = members[start:start + CLUB_MEMBERS_PER_PAGE]
+    if page_members:
+        roster_lines = []
+        for i, member in enumerate(page_members, start + 1):
+            role = member.get("role", "member")
+            role_text = f" • {role.replace('vicePresident', 'vice president').title()}" if role != "member" else ""
+            roster_lines.append(
+                f"**{i}. {member.get('name', 'Unknown')}** • {member.get('trophies', 0):,} 🏆{role_text}"
+            )
+        
+        embed.add_field(
+            name="📋 ROSTER",
+            value="\n".join(roster_lines),
+            inline=False
+        )
+    
+    embed.set_footer(text=f"Club Tag: {tag} • Page {page + 1}/{page_count}")
+    
+    return embed
+
+
+class ClubRosterView(discord.ui.View):
+    """Prev/next buttons that render roster pages on demand from the cached club"""
+    
+    def __init__(self, club, timeout=180):
+        super().__init__(timeout=timeout)
+        self.club = club
+        self.page = 0
+        self.page_count = max(1, -(-len(club.get("members", [])) // CLUB_MEMBERS_PER_PAGE))
+        self._update_buttons()
+    
+    def current_embed(self):
+        return build_brawl_stars_club_embed(self.club, self.page)
+    
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+    
+    async def _show_page(self, interaction, page):
+        self.page = page
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.current_embed(), view=self)
+    
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        await self._show_page(interaction, self.page - 1)
+    
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        await self._show_page(interaction, self.page + 1)
+
+
+# ============================
+# IMAGE CARDS
+# ============================
+# Specs for cards.render(); see cards.py for the format.
+# The API has no brawler artwork, so icons come from the Brawlify CDN.
+CARD_ACCENT = [255, 204, 0]
+BRAWLER_ICON_URL = "https://cdn.brawlify.com/brawlers/borderless/{id}.png"
+
+def _card_player(data):
+    return {
+        "name": data.get("name", "Unknown"),
+        "subtitle": data.get("tag", ""),
+        "stats": [
+            ["Trophies", f"{data.get('trophies', 0):,}"],
+            ["Highest", f"{data.get('highestTrophies', 0):,}"],
+            ["Level", data.get("expLevel", 0)],
+            ["3v3 wins", f"{data.get('3vs3Victories', 0):,}"],
+            ["Solo wins", f"{data.get('soloVictories', 0):,}"],
+            ["Duo wins", f"{data.get('duoVictories', 0):,}"],
+            ["Brawlers", len(data.get("brawlers", []))],
+        ],
+    }
+
+def build_brawl_stars_card(data):
+    """Image card for a player profile: key stats and top brawlers by trophies"""
+    top_brawlers = sorted(data.get("brawlers", []), key=lambda b: b.get("trophies", 0), reverse=True)[:8]
+    return {
+        "title": "BRAWL STARS",
+        "accent": CARD_ACCENT,
+        "players": [_card_player(data)],
+        "bar": None,
+        "icons": [
+            {"url": BRAWLER_ICON_URL.format(id=b["id"]) if "id" in b else None, "label": b.get("name", "?").title()}
+            for b in top_brawlers
+        ],
+    }
+
+def build_brawl_stars_comparison_card(data1, data2):
+    """Image card for a 1v1 comparison"""
+    p1_chance, p2_chance = calculate_win_probability(data1, data2)
+    return {
+        "title": "BRAWL STARS 1v1",
+        "accent": CARD_ACCENT,
+        "players": [_card_player(data1), _card_player(data2)],
+        "bar": {"label": "Win chance", "values": [p1_chance, p2_chance]},
+        "icons": [],
+    }
+
+
 # ============================
 # TEST FUNCTION
 # ============================
@@ -0,0 +1,234 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import urllib.request
+
+import tracing
+from cache import TTLCache
+
+# ============================
+# SETTINGS
+# ============================
+# Image cards are optional: they need Pillow (pip install Pillow) and are
+# switched on with IMAGE_CARDS=1. Without them embeds are sent exactly as before.
+# Each render costs tens of milliseconds of CPU per lookup, so they're off by default.
+IMAGE_CARDS = os.getenv("IMAGE_CARDS", "0") != "0"
+PILLOW_INSTALLED = importlib.util.find_spec("PIL") is not None
+CARD_WORKERS = int(os.getenv("CARD_WORKERS", "2"))
+CARD_CACHE_TTL = 600  # seconds a rendered card is reused for an identical payload
+CARD_CACHE_ENTRIES = 256
+CARD_FILENAME = "card.png"
+
+ASSET_DIR = "card_assets"  # downloaded deck/brawler icons
+ICON_DOWNLOAD_TIMEOUT = 5
+ICON_CACHE_ENTRIES = 512  # decoded icons kept per worker process
+
+CARD_WIDTH = 800
+BACKGROUND = (30, 31, 34)
+PANEL = (43, 45, 49)
+TEXT = (242, 243, 245)
+MUTED = (181, 186, 193)
+PLAYER_COLORS = ((250, 166, 26), (88, 101, 242))  # player 1 orange, player 2 blurple
+
+
+def enabled():
+    return IMAGE_CARDS and PILLOW_INSTALLED
+
+
+# ============================
+# RENDERING (MAIN PROCESS)
+# ============================
+# Rendering is CPU-bound, so it runs in worker processes and never on the event loop.
+# A card spec is a small JSON-able dict built by the game modules' build_*_card():
+#   {"title": str, "accent": [r, g, b],
+#    "players": [{"name": str, "subtitle": str, "stats": [[label, value], ...]}, ...],  # 1 or 2
+#    "bar": {"label": str, "values": [p1 %, p2 %]} or None,
+#    "icons": [{"url": str or None, "label": str}, ...]}
+_cards = TTLCache(ttl=CARD_CACHE_TTL, max_entries=CARD_CACHE_ENTRIES, name="cards")
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the bot process has threads (watchdog, exporters) that fork would copy mid-flight
+        _pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=CARD_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+
+def start():
+    """Start the worker processes (and their font loading) ahead of the first card"""
+    if enabled():
+        for _ in range(CARD_WORKERS):
+            _get_pool().submit(_ping)
+
+
+def card_key(spec):
+    """Payload hash: identical stats render to an identical card"""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def render(spec):
+    """Return PNG bytes for a card spec, or None if cards are off or rendering failed"""
+    if not enabled() or not spec:
+        return None
+    key = card_key(spec)
+    png = _cards.get(key)
+    if png is not None:
+        return png
+    loop = asyncio.get_running_loop()
+    try:
+        with tracing.span("card.render"):
+            png = await loop.run_in_executor(_get_pool(), render_card, spec)
+    except Exception as e:
+        print("CARD RENDER ERROR:", e)
+        return None
+    _cards.set(key, png)
+    return png
+
+
+# ============================
+# RENDERING (WORKER PROCESSES)
+# ============================
+_fonts = {}
+_icons = TTLCache(ttl=24 * 3600, max_entries=ICON_CACHE_ENTRIES)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _init_worker():
+    """Decode fonts once per worker process"""
+    for size in (16, 20, 24, 30):
+        _font(size)
+
+
+def _font(size):
+    from PIL import ImageFont
+
+    font = _fonts.get(size)
+    if font is None:
+        for name in ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf"):
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            font = ImageFont.load_default(size=size)
+        _fonts[size] = font
+    return font
+
+
+def _icon(url, size):
+    """Decoded, resized icon for url (downloaded once into ASSET_DIR), or None"""
+    from PIL import Image
+
+    key = (url, size)
+    icon = _icons.get(key)
+    if icon is not None:
+        return None if icon is False else icon  # False: failed recently, don't retry on every card
+    path = os.path.join(ASSET_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest()[:20] + ".png")
+    try:
+        if not os.path.exists(path):
+            with urllib.request.urlopen(url, timeout=ICON_DOWNLOAD_TIMEOUT) as r:
+                data = r.read()
+            os.makedirs(ASSET_DIR, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        icon = Image.open(path).convert("RGBA")
+        icon.thumbnail((size, size))
+    except Exception as e:
+        print("CARD ICON ERROR:", url, e)
+        _icons.set(key, False, ttl=600)
+        return None
+    _icons.set(key, icon)
+    return icon
+
+
+def _shorten(draw, text, font, width):
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def render_card(spec):
+    """Draw a card spec and return it as PNG bytes (runs in a worker process)"""
+    from PIL import Image, ImageDraw
+
+    players = spec["players"]
+    stat_rows = max(len(p["stats"]) for p in players)
+    icons = spec.get("icons") or []
+    icon_size = 80
+    icons_per_row = (CARD_WIDTH - 40) // (icon_size + 10)
+    icon_rows = -(-len(icons) // icons_per_row)
+
+    height = 80 + 70 + stat_rows * 32 + 30
+    if spec.get("bar"):
+        height += 80
+    if icons:
+        height += icon_rows * (icon_size + 32) + 10
+
+    image = Image.new("RGB", (CARD_WIDTH, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    accent = tuple(spec.get("accent") or PLAYER_COLORS[0])
+
+    # Header
+    draw.rectangle((0, 0, CARD_WIDTH, 60), fill=accent)
+    draw.text((20, 30), _shorten(draw, spec["title"], _font(30), CARD_WIDTH - 40), font=_font(30), fill=BACKGROUND, anchor="lm")
+
+    # One column per player
+    column_width = (CARD_WIDTH - 20 * (len(players) + 1)) // len(players)
+    top = 80
+    for i, player in enumerate(players):
+        left = 20 + i * (column_width + 20)
+        color = PLAYER_COLORS[i % 2] if len(players) > 1 else accent
+        draw.rounded_rectangle((left, top, left + column_width, top + 70 + stat_rows * 32), radius=10, fill=PANEL)
+        draw.rectangle((left, top + 10, left + 4, top + 50), fill=color)
+        draw.text((left + 16, top + 22), _shorten(draw, player["name"], _font(24), column_width - 32), font=_font(24), fill=TEXT, anchor="lm")
+        draw.text((left + 16, top + 46), player.get("subtitle", ""), font=_font(16), fill=MUTED, anchor="lm")
+        for row, (label, value) in enumerate(player["stats"]):
+            y = top + 80 + row * 32
+            draw.text((left + 16, y), label, font=_font(20), fill=MUTED, anchor="lm")
+            draw.text((left + column_width - 16, y), str(value), font=_font(20), fill=TEXT, anchor="rm")
+    top += 70 + stat_rows * 32 + 30
+
+    # Two-colour probability bar
+    bar = spec.get("bar")
+    if bar:
+        p1, p2 = bar["values"]
+        split = 20 + int((CARD_WIDTH - 40) * p1 / max(p1 + p2, 0.001))
+        draw.text((20, top), bar["label"], font=_font(20), fill=MUTED, anchor="lm")
+        draw.rounded_rectangle((20, top + 20, CARD_WIDTH - 20, top + 56), radius=8, fill=PLAYER_COLORS[1])
+        draw.rounded_rectangle((20, top + 20, max(split, 36), top + 56), radius=8, fill=PLAYER_COLORS[0])
+        draw.text((32, top + 38), f"{p1}%", font=_font(20), fill=BACKGROUND, anchor="lm")
+        draw.text((CARD_WIDTH - 32, top + 38), f"{p2}%", font=_font(20), fill=TEXT, anchor="rm")
+        top += 80
+
+    # Deck / brawler icons, with a lettered tile when an icon can't be loaded
+    for i, entry in enumerate(icons):
+        x = 20 + (i % icons_per_row) * (icon_size + 10)
+        y = top + (i // icons_per_row) * (icon_size + 32)
+        icon = _icon(entry["url"], icon_size) if entry.get("url") else None
+        if icon is not None:
+            image.paste(icon, (x + (icon_size - icon.width) // 2, y + (icon_size - icon.height) // 2), icon)
+        else:
+            draw.rounded_rectangle((x, y, x + icon_size, y + icon_size), radius=10, fill=PANEL)
+            draw.text((x + icon_size // 2, y + icon_size // 2), entry["label"][:2].upper(), font=_font(30), fill=MUTED, anchor="mm")
+        draw.text((x + icon_size // 2, y + icon_size + 14), _shorten(draw, entry["label"], _font(16), icon_size + 8), font=_font(16), fill=MUTED, anchor="mm")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
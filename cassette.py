@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+# ============================
+# RECORD / REPLAY
+# ============================
+# API_CASSETTE_MODE=record   real requests, every response also saved as a cassette
+# API_CASSETTE_MODE=replay   responses served from cassettes, no network at all
+# unset                      plain (pooled) requests
+API_CASSETTE_MODE = os.getenv("API_CASSETTE_MODE", "").lower()
+API_CASSETTE_DIR = os.getenv("API_CASSETTE_DIR", "cassettes")
+API_CASSETTE_LATENCY_MS = float(os.getenv("API_CASSETTE_LATENCY_MS", "0"))  # simulated upstream latency on replay
+
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+
+_write_lock = threading.Lock()
+
+# One pooled session for every game API, so requests reuse TCP/TLS connections.
+# Its default Accept-Encoding already asks for gzip/deflate, so big profiles arrive compressed.
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when no cassette matches a request"""
+
+
+class CassetteResponse:
+    """The parts of requests.Response the API helpers use"""
+
+    def __init__(self, status_code, headers, text):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def warm_up(base_url, timeout=5):
+    """Open a pooled connection to an API host ahead of the first real request"""
+    if API_CASSETTE_MODE == "replay":
+        return
+    try:
+        # Unauthenticated HEAD: enough for the TCP/TLS handshake, costs no API quota
+        _session.head(base_url, timeout=timeout)
+    except requests.RequestException as e:
+        print("WARM-UP ERROR:", base_url, e)
+
+
+def _cassette_path(url, params):
+    # Headers are left out of the key on purpose: they carry the API keys
+    key = json.dumps([url, sorted((params or {}).items())])
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(API_CASSETTE_DIR, f"{name}.json")
+
+
+def get(url, headers=None, params=None, timeout=None):
+    """Drop-in replacement for requests.get (pooled) that records or replays cassettes"""
+    if API_CASSETTE_MODE == "replay":
+        path = _cassette_path(url, params)
+        if not os.path.exists(path):
+            raise CassetteMissError(f"No cassette for {url} {params or ''}")
+        with open(path, "r", encoding="utf-8") as f:
+            cassette = json.load(f)
+        if API_CASSETTE_LATENCY_MS:
+            time.sleep(API_CASSETTE_LATENCY_MS / 1000)
+        response = cassette["response"]
+        return CassetteResponse(response["status_code"], response["headers"], response["body"])
+
+    if API_CASSETTE_MODE == "record" and headers:
+        # Cassettes must hold full responses: a revalidation would come back as a
+        # body-less 304 that replay (whose key ignores headers) can't make sense of
+        headers = {name: value for name, value in headers.items() if name.lower() not in CONDITIONAL_HEADERS}
+
+    r = _session.get(url, headers=headers, params=params, timeout=timeout)
+
+    if API_CASSETTE_MODE == "record":
+        cassette = {
+            "request": {"url": url, "params": params},
+            "response": {"status_code": r.status_code, "headers": dict(r.headers), "body": r.text},
+            "recorded_at": time.time(),
+        }
+        path = _cassette_path(url, params)
+        with _write_lock:
+            if r.status_code == 304 and os.path.exists(path):
+                return r  # never replace a recorded body with "not modified"
+            os.makedirs(API_CASSETTE_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(cassette, f, indent=2, ensure_ascii=False)
+    return r
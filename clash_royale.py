@@ -1,31 +1,74 @@
-import requests
 import urllib.parse
 import discord
 import json
 import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import autocomplete
+import cassette
+import http_cache
+import metrics
+import quotas
+import reference_data
+import scheduler
+import tracing
+from cache import TTLCache
+from supercell import InvalidTagError, canonicalize_tag
 
 # ============================
 # CLASH ROYALE API
 # ============================
-CLASH_ROYALE_BASE = "https://api.clashroyale.com/v1"
+# Overridable so load tests can point at a local stub server
+CLASH_ROYALE_BASE = os.getenv("CLASH_ROYALE_API_BASE", "https://api.clashroyale.com/v1")
+
+# Unknown/invalid tags are remembered briefly so retrying a typo doesn't
+# spend another request. Transient errors (5xx, 429, timeouts) are never cached.
+NOT_FOUND_CACHE_TTL = 120  # seconds
+NEGATIVE_STATUS_CODES = (400, 404)
+
+_not_found_cache = TTLCache(ttl=NOT_FOUND_CACHE_TTL, max_entries=4096, name="cr_not_found")
+_last_good = http_cache.LastGood(name="cr_last_good")
 
 def clash_royale_api_get(path, api_key):
     """Helper to make GET requests to Clash Royale API"""
+    if _not_found_cache.get(path) is not None:
+        return None
+    url = f"{CLASH_ROYALE_BASE}{path}"
     try:
-        r = requests.get(
-            f"{CLASH_ROYALE_BASE}{path}",
-            headers={"Authorization": f"Bearer {api_key}"},
-            timeout=10
-        )
+        cached = http_cache.fresh(url)
+        if cached is not None:
+            return cached.json()
+        quotas.note_upstream_call()
+        headers, revalidated = http_cache.conditional_headers(url, headers={"Authorization": f"Bearer {api_key}"})
+        with scheduler.upstream_slot("clash_royale"), metrics.track_upstream("clash_royale") as call:
+            r = cassette.get(
+                url,
+                headers=headers,
+                timeout=10
+            )
+            call.status = r.status_code
+        # Honors Cache-Control max-age; a 304 hands back the cached response
+        r = http_cache.update(url, None, r, revalidated)
+        if r.status_code in NEGATIVE_STATUS_CODES:
+            print("CLASH ROYALE API ERROR:", r.status_code, r.text)
+            _not_found_cache.set(path, r.status_code)
+            return None
         if r.status_code != 200:
             print("CLASH ROYALE API ERROR:", r.status_code, r.text)
             return None
+        _last_good.remember(url, None, r)
         return r.json()
+    except scheduler.Cancelled:
+        return None
     except Exception as e:
         print("CLASH ROYALE REQUEST ERROR:", e)
         return None
 
 
+@metrics.timed_phase("fetch")
+@tracing.traced
 def fetch_clash_royale_stats(player_tag, api_key):
     """Fetch Clash Royale player stats. Player tag must include #"""
     # URL encode the player tag (e.g., #2ABC becomes %232ABC)
@@ -33,6 +76,17 @@ def fetch_clash_royale_stats(player_tag, api_key):
     return clash_royale_api_get(f"/players/{encoded_tag}", api_key)
 
 
+def player_not_found(player_tag):
+    """True if the API recently answered that this player doesn't exist, as opposed
+    to a failed request (rate limit, outage, timeout) that is worth retrying"""
+    return _not_found_cache.get(f"/players/{urllib.parse.quote(player_tag)}") is not None
+
+
+def cached_clash_royale_stats(player_tag):
+    """(stats, age in seconds) from the last API response for this player, however old, or None"""
+    return _last_good.get(f"{CLASH_ROYALE_BASE}/players/{urllib.parse.quote(player_tag)}")
+
+
 # ============================
 # PLAYER REGISTRATION STORAGE
 # ============================
@@ -50,37 +104,280 @@ def load_registrations():
 
 def save_registrations(registrations):
     """Save registered players to file"""
-    with open(REGISTRATION_FILE, 'w') as f:
+    # Written whole and swapped in, so a crash mid-write never loses registrations
+    tmp_path = REGISTRATION_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
         json.dump(registrations, f, indent=2)
+    os.replace(tmp_path, REGISTRATION_FILE)
 
 def register_player(username, player_tag):
     """Register a username with their player tag"""
     registrations = load_registrations()
-    # Ensure tag starts with #
-    if not player_tag.startswith("#"):
-        player_tag = "#" + player_tag
+    player_tag = canonicalize_tag(player_tag)
     registrations[username.lower()] = player_tag
     save_registrations(registrations)
+    registration_index().add(username.lower(), player_tag)
     return player_tag
 
-def get_player_tag(username):
-    """Get player tag from registered username"""
+def register_players(entries, overwrite=False, own_tags=None):
+    """Register many username → canonical tag entries with a single save.
+    overwrite replaces usernames registered to another tag, but only tags in
+    own_tags when it's given. Returns (saved, skipped): skipped usernames were
+    already registered to another tag and kept."""
     registrations = load_registrations()
-    return registrations.get(username.lower())
+    saved = {}
+    skipped = []
+    for username, player_tag in entries.items():
+        username = username.lower()
+        current = registrations.get(username, player_tag)
+        if current != player_tag and not (overwrite and (own_tags is None or current in own_tags)):
+            skipped.append(username)
+            continue
+        saved[username] = player_tag
+    registrations.update(saved)
+    save_registrations(registrations)
+    index = registration_index()
+    for username, player_tag in saved.items():
+        index.add(username, player_tag)
+    return saved, skipped
+
+@tracing.traced
+def get_player_tag(username):
+    """Get player tag from registered username, tolerating small typos.
+    Input that is itself a valid tag is only matched exactly, never fuzzily."""
+    username = username.strip().lower()
+    index = registration_index()
+    tag = index.get(username)
+    if tag is not None or username.startswith("#"):
+        return tag
+    try:
+        canonicalize_tag(username)
+        return None
+    except InvalidTagError:
+        # Resolved locally, before a typo can turn into a failed API call
+        return autocomplete.confident_match(index.similar(username))
+
+def resolve_player_tag(player):
+    """Resolve a registered username or a raw player tag to a canonical tag.
+    Raises InvalidTagError if player is neither, naming any close registered usernames."""
+    tag = get_player_tag(player)
+    if tag:
+        return tag
+    try:
+        return canonicalize_tag(player)
+    except InvalidTagError as e:
+        matches = registration_index().similar(player.strip().lower())
+        if not matches:
+            raise
+        names = ", ".join(f"`{name}`" for name, _, _ in matches)
+        raise InvalidTagError(f"{e}\nDid you mean {names}?") from None
 
 def unregister_player(username):
-    """Remove a registered player"""
+    """Remove a registered player; returns the tag they were registered to, or None"""
     registrations = load_registrations()
     if username.lower() in registrations:
-        del registrations[username.lower()]
+        player_tag = registrations.pop(username.lower())
         save_registrations(registrations)
-        return True
-    return False
+        registration_index().remove(username.lower())
+        return player_tag
+    return None
+
+
+# ============================
+# AUTOCOMPLETE
+# ============================
+_registration_index = None
+_recent_tags = autocomplete.RecentTags()
+
+def registration_index():
+    """In-memory index over registered usernames (exact, prefix and fuzzy), built on first use"""
+    global _registration_index
+    if _registration_index is None:
+        _registration_index = autocomplete.RegistrationIndex(load_registrations())
+    return _registration_index
+
+def remember_lookup(guild_id, data):
+    """Offer a successfully looked-up player in this guild's autocomplete and deck stats"""
+    if guild_id is not None and data.get("tag"):
+        _recent_tags.add(guild_id, data["tag"], data.get("name", "Unknown"))
+    index_deck(data, guild_id)
+
+def player_suggestions(current, guild_id=None):
+    """(label, value) autocomplete choices for a player parameter"""
+    return autocomplete.player_suggestions(registration_index(), _recent_tags, current, guild_id)
+
+
+# ============================
+# REFERENCE DATA
+# ============================
+cards_catalog = reference_data.Catalog("clash_royale_cards")
+
+def refresh_reference_data(api_key):
+    """Load the card catalog, re-fetching /cards if the stored copy is over a day old"""
+    cards_catalog.refresh(lambda: (clash_royale_api_get("/cards", api_key) or {}).get("items"))
+
+def card_max_level(card):
+    """A card's max level, from the catalog (falling back to the player data)"""
+    info = cards_catalog.get(card.get("id")) or card
+    return info.get("maxLevel", 0)
+
+def normalized_card_level(card):
+    """Card level on the common-card scale; the API's levels are relative to rarity"""
+    level = card.get("level", 0)
+    top_level = max((c.get("maxLevel", 0) for c in cards_catalog.values()), default=0)
+    max_level = card_max_level(card)
+    if not top_level or not max_level:
+        return level
+    return level + top_level - max_level
+
+
+# ============================
+# DECK INDEX
+# ============================
+# Every looked-up player's current deck is kept as a bitset over card IDs: the
+# same 8 cards in any order give the same int, and deck similarity is two
+# popcounts (Jaccard) instead of comparing card lists.
+DECK_INDEX_FILE = "clash_royale_decks.json"
+DECK_INDEX_MAX_PLAYERS = 50_000
+
+_deck_lock = threading.Lock()
+_deck_index = OrderedDict()  # tag → {"name", "deck" (bitset), "guilds" (set), "updated_at"}, oldest first
+_deck_index_dirty = False
+_card_bits = {}  # card ID → bit
+_bit_cards = []  # bit → card ID
+_card_names = {}  # card ID → name
+
+def _card_bit(card_id):
+    bit = _card_bits.get(card_id)
+    if bit is None:
+        bit = _card_bits[card_id] = len(_bit_cards)
+        _bit_cards.append(card_id)
+    return bit
+
+def deck_fingerprint(cards):
+    """Order-independent bitset for a list of card IDs"""
+    fingerprint = 0
+    for card_id in cards:
+        fingerprint |= 1 << _card_bit(card_id)
+    return fingerprint
+
+def deck_cards(fingerprint):
+    """Card IDs in a fingerprint"""
+    cards = []
+    while fingerprint:
+        low_bit = fingerprint & -fingerprint
+        cards.append(_bit_cards[low_bit.bit_length() - 1])
+        fingerprint ^= low_bit
+    return cards
+
+def deck_similarity(deck1, deck2):
+    """Jaccard similarity of two fingerprints (1.0 = same cards)"""
+    union = (deck1 | deck2).bit_count()
+    return (deck1 & deck2).bit_count() / union if union else 0.0
+
+def card_name(card_id):
+    info = cards_catalog.get(card_id)
+    return info["name"] if info else _card_names.get(card_id, str(card_id))
+
+def _add_deck(tag, name, cards, guilds, updated_at):
+    # Called with _deck_lock held
+    _deck_index[tag] = {"name": name, "deck": deck_fingerprint(cards), "guilds": guilds, "updated_at": updated_at}
+    _deck_index.move_to_end(tag)
+    while len(_deck_index) > DECK_INDEX_MAX_PLAYERS:
+        _deck_index.popitem(last=False)
+
+def index_deck(data, guild_id=None):
+    """Index a fetched player's current deck, seen in guild_id"""
+    global _deck_index_dirty
+    deck = data.get("currentDeck") or []
+    tag = data.get("tag")
+    if not tag or not deck:
+        return
+    with _deck_lock:
+        for card in deck:
+            _card_names.setdefault(card.get("id"), card.get("name", "Unknown"))
+        entry = _deck_index.get(tag)
+        guilds = entry["guilds"] if entry else set()
+        if guild_id is not None:
+            guilds.add(guild_id)
+        _add_deck(tag, data.get("name", "Unknown"), [card.get("id") for card in deck], guilds, time.time())
+        _deck_index_dirty = True
+
+def load_deck_index():
+    """Load the saved deck index (once)"""
+    if _deck_index or not os.path.exists(DECK_INDEX_FILE):
+        return
+    try:
+        with open(DECK_INDEX_FILE, 'r') as f:
+            stored = json.load(f)
+    except:
+        return
+    with _deck_lock:
+        _card_names.update({int(card_id): name for card_id, name in stored.get("card_names", {}).items()})
+        for tag, entry in sorted(stored.get("players", {}).items(), key=lambda item: item[1]["updated_at"]):
+            _add_deck(tag, entry["name"], entry["cards"], set(entry["guilds"]), entry["updated_at"])
+
+def save_deck_index():
+    """Save the deck index if it changed since the last save"""
+    global _deck_index_dirty
+    with _deck_lock:
+        if not _deck_index_dirty:
+            return
+        stored = {
+            "card_names": _card_names.copy(),
+            "players": {
+                tag: {"name": e["name"], "cards": deck_cards(e["deck"]), "guilds": sorted(e["guilds"]), "updated_at": e["updated_at"]}
+                for tag, e in _deck_index.items()
+            },
+        }
+        _deck_index_dirty = False
+    tmp_path = DECK_INDEX_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(stored, f)
+    os.replace(tmp_path, DECK_INDEX_FILE)
+
+def guild_deck_stats(guild_id, top=5):
+    """(player count, most common (deck, count), most used (card ID, count)) among players seen in a guild (None: everywhere)"""
+    with _deck_lock:
+        decks = [e["deck"] for e in _deck_index.values() if guild_id is None or guild_id in e["guilds"]]
+    card_counts = Counter()
+    for deck in decks:
+        card_counts.update(deck_cards(deck))
+    return len(decks), Counter(decks).most_common(top), card_counts.most_common(top * 2)
+
+def similar_decks(tag, guild_id=None, top=5):
+    """Up to top (similarity, name, tag) for players whose deck is closest to tag's, in guild_id if given"""
+    with _deck_lock:
+        entry = _deck_index.get(tag)
+        if entry is None:
+            return []
+        deck = entry["deck"]
+        candidates = [
+            (deck_similarity(deck, e["deck"]), e["name"], other)
+            for other, e in _deck_index.items()
+            if other != tag and (guild_id is None or guild_id in e["guilds"])
+        ]
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    return [c for c in candidates[:top] if c[0] > 0]
+
+
+# ============================
+# STARTUP
+# ============================
+def warm_up(api_key=None):
+    """Open a pooled API connection, index the registrations and load reference data before the first command"""
+    cassette.warm_up(CLASH_ROYALE_BASE)
+    registration_index()
+    load_deck_index()
+    if api_key:
+        refresh_reference_data(api_key)
 
 
 # ============================
 # EMBED BUILDERS
 # ============================
+@metrics.timed_phase("render")
+@tracing.traced
 def build_clash_royale_embed(data):
     """Build embed for Clash Royale player stats"""
     
@@ -179,14 +476,15 @@ def build_clash_royale_embed(data):
         deck_cards = []
         for card in data["currentDeck"][:8]:
             card_name = card.get("name", "Unknown")
-            card_level = card.get("level", 0)
+            card_level = normalized_card_level(card)
             evolution_level = card.get("evolutionLevel", 0)
+            maxed = "👑" if card.get("level", 0) >= card_max_level(card) > 0 else ""
             
             # Add evolution indicator if evolved
             if evolution_level > 0:
-                deck_cards.append(f"{card_name} Lv{card_level}⭐")
+                deck_cards.append(f"{card_name} Lv{card_level}{maxed}⭐")
             else:
-                deck_cards.append(f"{card_name} Lv{card_level}")
+                deck_cards.append(f"{card_name} Lv{card_level}{maxed}")
         
         if deck_cards:
             # Split into two rows for better formatting
@@ -224,6 +522,44 @@ def build_clash_royale_embed(data):
     return embed
 
 
+def digest_entry(data):
+    """The stats a guild digest compares from one day to the next"""
+    return {"name": data.get("name", "Unknown"), "trophies": data.get("trophies", 0), "best": data.get("bestTrophies", 0)}
+
+def watch_entry(data):
+    """What /watch polls compare: trophies for milestones, battle count for activity"""
+    return {"name": data.get("name", "Unknown"), "trophies": data.get("trophies", 0), "activity": data.get("battleCount", 0)}
+
+def calculate_win_probability(data1, data2):
+    """Calculate (player 1 %, player 2 %) win chances from trophies 50%, win rate 30%, 3-crown wins 20%"""
+    trophies1 = data1.get("trophies", 0)
+    trophies2 = data2.get("trophies", 0)
+    three_crown1 = data1.get("threeCrownWins", 0)
+    three_crown2 = data2.get("threeCrownWins", 0)
+    battles1 = data1.get("battleCount", 0)
+    battles2 = data2.get("battleCount", 0)
+    wr1 = (data1.get("wins", 0) / battles1 * 100) if battles1 > 0 else 0
+    wr2 = (data2.get("wins", 0) / battles2 * 100) if battles2 > 0 else 0
+    
+    trophy_score1 = (trophies1 / (trophies1 + trophies2) * 50) if (trophies1 + trophies2) > 0 else 25
+    trophy_score2 = (trophies2 / (trophies1 + trophies2) * 50) if (trophies1 + trophies2) > 0 else 25
+    
+    wr_score1 = (wr1 / (wr1 + wr2) * 30) if (wr1 + wr2) > 0 else 15
+    wr_score2 = (wr2 / (wr1 + wr2) * 30) if (wr1 + wr2) > 0 else 15
+    
+    tc_score1 = (three_crown1 / (three_crown1 + three_crown2) * 20) if (three_crown1 + three_crown2) > 0 else 10
+    tc_score2 = (three_crown2 / (three_crown1 + three_crown2) * 20) if (three_crown1 + three_crown2) > 0 else 10
+    
+    total1 = trophy_score1 + wr_score1 + tc_score1
+    total2 = trophy_score2 + wr_score2 + tc_score2
+    
+    p1_chance = round((total1 / (total1 + total2) * 100), 1)
+    p2_chance = round((total2 / (total1 + total2) * 100), 1)
+    return p1_chance, p2_chance
+
+
+@metrics.timed_phase("render")
+@tracing.traced
 def build_clash_comparison_embed(data1, data2):
     """Build a comparison embed for two Clash Royale players"""
     
@@ -253,21 +589,7 @@ def build_clash_comparison_embed(data1, data2):
     three_crown1 = data1.get("threeCrownWins", 0)
     three_crown2 = data2.get("threeCrownWins", 0)
     
-    # Calculate win probability (based on trophies 50%, win rate 30%, 3-crown 20%)
-    trophy_score1 = (trophies1 / (trophies1 + trophies2) * 50) if (trophies1 + trophies2) > 0 else 25
-    trophy_score2 = (trophies2 / (trophies1 + trophies2) * 50) if (trophies1 + trophies2) > 0 else 25
-    
-    wr_score1 = (wr1 / (wr1 + wr2) * 30) if (wr1 + wr2) > 0 else 15
-    wr_score2 = (wr2 / (wr1 + wr2) * 30) if (wr1 + wr2) > 0 else 15
-    
-    tc_score1 = (three_crown1 / (three_crown1 + three_crown2) * 20) if (three_crown1 + three_crown2) > 0 else 10
-    tc_score2 = (three_crown2 / (three_crown1 + three_crown2) * 20) if (three_crown1 + three_crown2) > 0 else 10
-    
-    total1 = trophy_score1 + wr_score1 + tc_score1
-    total2 = trophy_score2 + wr_score2 + tc_score2
-    
-    p1_chance = round((total1 / (total1 + total2) * 100), 1)
-    p2_chance = round((total2 / (total1 + total2) * 100), 1)
+    p1_chance, p2_chance = calculate_win_probability(data1, data2)
     
     # Determine winner
     if p1_chance > p2_chance:
@@ -354,6 +676,97 @@ def build_clash_comparison_embed(data1, data2):
     return embed
 
 
+@metrics.timed_phase("render")
+@tracing.traced
+def build_crmeta_embed(stats, player_name=None, similar=None):
+    """Build the /crmeta embed from guild_deck_stats() and, optionally, similar_decks() for one player"""
+    players, top_decks, top_cards = stats
+    
+    embed = discord.Embed(
+        title="📊 CLASH ROYALE META",
+        description=(
+            f"Decks of **{players}** player{'s' if players != 1 else ''} looked up in this server"
+            if players else "No decks yet. Look players up with `/clashroyale` first!"
+        ),
+        color=discord.Color.blue()
+    )
+    
+    if top_decks:
+        deck_lines = []
+        for i, (deck, count) in enumerate(top_decks, 1):
+            cards = ", ".join(card_name(card_id) for card_id in deck_cards(deck))
+            deck_lines.append(f"**{i}.** {count}× — {cards}")
+        embed.add_field(name="🔥 MOST COMMON DECKS", value="\n".join(deck_lines), inline=False)
+    
+    if top_cards:
+        card_lines = [f"**{card_name(card_id)}** — {count / players * 100:.0f}%" for card_id, count in top_cards]
+        embed.add_field(name="🃏 MOST USED CARDS", value="\n".join(card_lines), inline=False)
+    
+    if similar is not None:
+        similar_lines = [
+            f"**{name}** `{tag}` — {similarity * 100:.0f}% same cards"
+            for similarity, name, tag in similar
+        ]
+        embed.add_field(
+            name=f"👯 DECKS LIKE {player_name}'s".upper(),
+            value="\n".join(similar_lines) if similar_lines else "No similar decks in this server yet.",
+            inline=False
+        )
+    
+    return embed
+
+
+# ============================
+# IMAGE CARDS
+# ============================
+# Specs for cards.render(); see cards.py for the format
+CARD_ACCENT = [250, 166, 26]
+
+def _card_player(data):
+    battles = data.get("battleCount", 0)
+    win_rate = (data.get("wins", 0) / battles * 100) if battles > 0 else 0
+    return {
+        "name": data.get("name", "Unknown"),
+        "subtitle": data.get("tag", ""),
+        "stats": [
+            ["Trophies", f"{data.get('trophies', 0):,}"],
+            ["Best", f"{data.get('bestTrophies', 0):,}"],
+            ["Level", data.get("expLevel", 0)],
+            ["Wins", f"{data.get('wins', 0):,}"],
+            ["Win rate", f"{win_rate:.1f}%"],
+            ["3-crown wins", f"{data.get('threeCrownWins', 0):,}"],
+        ],
+    }
+
+def _card_icon_url(card):
+    info = cards_catalog.get(card.get("id")) or {}
+    return (card.get("iconUrls") or info.get("iconUrls") or {}).get("medium")
+
+def build_clash_royale_card(data):
+    """Image card for a player profile: key stats and the current deck"""
+    return {
+        "title": "CLASH ROYALE",
+        "accent": CARD_ACCENT,
+        "players": [_card_player(data)],
+        "bar": None,
+        "icons": [
+            {"url": _card_icon_url(card), "label": card.get("name", "?")}
+            for card in (data.get("currentDeck") or [])[:8]
+        ],
+    }
+
+def build_clash_comparison_card(data1, data2):
+    """Image card for a 1v1 comparison"""
+    p1_chance, p2_chance = calculate_win_probability(data1, data2)
+    return {
+        "title": "CLASH ROYALE 1v1",
+        "accent": CARD_ACCENT,
+        "players": [_card_player(data1), _card_player(data2)],
+        "bar": {"label": "Win chance", "values": [p1_chance, p2_chance]},
+        "icons": [],
+    }
+
+
 # ============================
 # TEST FUNCTION
 # ============================
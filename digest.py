@@ -0,0 +1,189 @@
+import datetime
+import json
+import os
+import threading
+
+import discord
+
+# ============================
+# SETTINGS
+# ============================
+# Once a day every guild with a digest channel gets a summary of its registered
+# players. All guilds are served from one batch: a player registered in several
+# guilds is fetched once, at BACKGROUND priority.
+DIGEST_FILE = "guild_digests.json"
+DIGEST_HOUR_UTC = int(os.getenv("DIGEST_HOUR_UTC", "18"))
+DIGEST_TOP = 5
+
+GAME_LABELS = {"clash_royale": "👑 Clash Royale", "brawl_stars": "⭐ Brawl Stars"}
+
+_lock = threading.Lock()
+
+
+# ============================
+# STORAGE
+# ============================
+# {"channels": {guild ID: channel ID},
+#  "players": {game: {guild ID: [tag, ...]}},    guilds each tag was registered from
+#  "snapshots": {game: {tag: {"name", "trophies", "best"}}}}    as of the last digest
+def load_state():
+    """Load digest channels, guild players and snapshots from file"""
+    state = {}
+    if os.path.exists(DIGEST_FILE):
+        try:
+            with open(DIGEST_FILE, 'r') as f:
+                state = json.load(f)
+        except:
+            state = {}
+    for key in ("channels", "players", "snapshots"):
+        state.setdefault(key, {})
+    return state
+
+def save_state(state):
+    """Save digest state to file"""
+    tmp_path = DIGEST_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, DIGEST_FILE)
+
+def set_channel(guild_id, channel_id):
+    """Post this guild's digest in channel_id (None turns it off); returns True if it changed"""
+    with _lock:
+        state = load_state()
+        previous = state["channels"].get(str(guild_id))
+        if channel_id is None:
+            state["channels"].pop(str(guild_id), None)
+        else:
+            state["channels"][str(guild_id)] = channel_id
+        save_state(state)
+    return previous != channel_id
+
+def guild_players(game, guild_id):
+    """Set of tags registered from a guild"""
+    with _lock:
+        state = load_state()
+    return set(state["players"].get(game, {}).get(str(guild_id), ()))
+
+def add_players(game, guild_id, tags):
+    """Count registered tags as players of a guild for its digest"""
+    if guild_id is None:
+        return
+    with _lock:
+        state = load_state()
+        guild_tags = state["players"].setdefault(game, {}).setdefault(str(guild_id), [])
+        known = set(guild_tags)
+        guild_tags.extend(tag for tag in dict.fromkeys(tags) if tag not in known)
+        save_state(state)
+
+
+def remove_players(game, tags):
+    """Stop counting tags as any guild's players (once nobody is registered to them)"""
+    tags = set(tags)
+    with _lock:
+        state = load_state()
+        guilds = state["players"].get(game, {})
+        for guild_id, guild_tags in list(guilds.items()):
+            kept = [tag for tag in guild_tags if tag not in tags]
+            if kept:
+                guilds[guild_id] = kept
+            else:
+                del guilds[guild_id]
+        save_state(state)
+
+
+# ============================
+# BATCH
+# ============================
+def seconds_until_next_run(now=None):
+    """Seconds until the next DIGEST_HOUR_UTC o'clock"""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    next_run = now.replace(hour=DIGEST_HOUR_UTC, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += datetime.timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+def unique_tags(state, game, registered):
+    """Every still-registered tag of game across all digest guilds, each once"""
+    guild_players = state["players"].get(game, {})
+    tags = set()
+    for guild_id in state["channels"]:
+        tags.update(guild_players.get(guild_id, ()))
+    return sorted(tags & registered)
+
+
+# ============================
+# DIGESTS
+# ============================
+def _game_field(players, snapshots, tags):
+    """(summary, climbers, personal bests) lines for one guild's players of one game"""
+    climbers = []
+    personal_bests = []
+    total_gain = 0
+    tracked = 0
+    compared = 0
+    for tag in tags:
+        player = players.get(tag)
+        previous = snapshots.get(tag)
+        if player is None:
+            continue
+        tracked += 1
+        if previous is None:
+            continue
+        compared += 1
+        gain = player["trophies"] - previous["trophies"]
+        total_gain += gain
+        if gain > 0:
+            climbers.append((gain, player["name"]))
+        if player["best"] > previous["best"]:
+            personal_bests.append((player["best"], player["name"]))
+
+    climbers.sort(reverse=True)
+    personal_bests.sort(reverse=True)
+    summary = f"**{tracked}** player{'s' if tracked != 1 else ''} · "
+    if compared:
+        summary += f"**{total_gain:+,}** 🏆 since the last digest"
+    else:
+        summary += "trophy changes show from the next digest"
+    climber_lines = [f"**{name}** +{gain:,} 🏆" for gain, name in climbers[:DIGEST_TOP]]
+    best_lines = [f"**{name}** — {best:,} 🏆" for best, name in personal_bests[:DIGEST_TOP]]
+    return summary, climber_lines, best_lines
+
+def build_digest_embeds(state, players):
+    """{guild ID: digest embed} for every digest guild with tracked players.
+    players is {game: {tag: {"name", "trophies", "best"}}} from this run's batch."""
+    embeds = {}
+    for guild_id in state["channels"]:
+        embed = discord.Embed(
+            title="📰 DAILY DIGEST",
+            description="How this server's registered players did today",
+            color=discord.Color.gold()
+        )
+        for game, game_players in players.items():
+            tags = state["players"].get(game, {}).get(guild_id, ())
+            if not any(tag in game_players for tag in tags):
+                continue
+            summary, climbers, personal_bests = _game_field(game_players, state["snapshots"].get(game, {}), tags)
+            lines = [summary]
+            if climbers:
+                lines.append("📈 **Top climbers**\n" + "\n".join(climbers))
+            if personal_bests:
+                lines.append("⭐ **New personal bests**\n" + "\n".join(personal_bests))
+            embed.add_field(name=GAME_LABELS.get(game, game), value="\n\n".join(lines)[:1024], inline=False)
+        if embed.fields:
+            embeds[guild_id] = embed
+    return embeds
+
+def record_snapshots(players):
+    """Make this run's trophies the baseline for the next digest"""
+    with _lock:
+        state = load_state()
+        for game, game_players in players.items():
+            snapshots = state["snapshots"].setdefault(game, {})
+            snapshots.update(game_players)
+            # Players no guild tracks any more don't need a baseline
+            tracked = set()
+            for tags in state["players"].get(game, {}).values():
+                tracked.update(tags)
+            for tag in set(snapshots) - tracked:
+                del snapshots[tag]
+        save_state(state)
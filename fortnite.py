@@ -1,50 +1,263 @@
-import requests
+import urllib.parse
 import discord
 import json
+import os
+import threading
+
+import cassette
+import http_cache
+import metrics
+import quotas
+import scheduler
+import tracing
+from cache import TTLCache
 
 # ============================
 # FORTNITE API
 # ============================
-FORTNITE_BASE = "https://fortnite-api.com/v2"
+# Overridable so load tests can point at a local stub server
+FORTNITE_BASE = os.getenv("FORTNITE_API_BASE", "https://fortnite-api.com/v2")
+
+# Private (403) and unknown (404) accounts are remembered briefly so retries
+# are answered locally. Transient errors (5xx, 429, timeouts) are never cached.
+NEGATIVE_CACHE_TTLS = {
+    403: 60,
+    404: 120,
+}
+
+_negative_cache = TTLCache(ttl=NEGATIVE_CACHE_TTLS[404], max_entries=4096, name="fn_negative")
+_last_good = http_cache.LastGood(name="fn_last_good")
 
 def fortnite_api_get(path, params, api_key):
     """Helper to make GET requests to Fortnite API"""
+    cache_key = (path, tuple(sorted((params or {}).items())))
+    cached = _negative_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    url = f"{FORTNITE_BASE}{path}"
     try:
-        r = requests.get(
-            f"{FORTNITE_BASE}{path}",
-            headers={"Authorization": api_key},
-            params=params,
-            timeout=10
-        )
+        cached = http_cache.fresh(url, params)
+        if cached is not None:
+            return cached.json()
+        quotas.note_upstream_call()
+        headers, revalidated = http_cache.conditional_headers(url, params, {"Authorization": api_key})
+        with scheduler.upstream_slot("fortnite"), metrics.track_upstream("fortnite") as call:
+            r = cassette.get(
+                url,
+                headers=headers,
+                params=params,
+                timeout=10
+            )
+            call.status = r.status_code
+        # Honors Cache-Control max-age; a 304 hands back the cached response
+        r = http_cache.update(url, params, r, revalidated)
+        if r.status_code in NEGATIVE_CACHE_TTLS:
+            # Private/unknown accounts come back as JSON bodies with a "status"
+            # field, which callers use to tell them apart from outages
+            print("FORTNITE API ERROR:", r.status_code, r.text)
+            try:
+                data = r.json()
+            except ValueError:
+                data = {"status": r.status_code}
+            _negative_cache.set(cache_key, data, ttl=NEGATIVE_CACHE_TTLS[r.status_code])
+            return data
         if r.status_code != 200:
             print("FORTNITE API ERROR:", r.status_code, r.text)
             return None
+        _last_good.remember(url, params, r)
         return r.json()
+    except scheduler.Cancelled:
+        return None
     except Exception as e:
         print("FORTNITE REQUEST ERROR:", e)
         return None
 
 
-def fetch_fortnite_stats(username, account_type, api_key):
-    """Fetch Fortnite stats for a player."""
-    return fortnite_api_get(
+# Stats windows the API supports, and how long each may be served from cache.
+# Lifetime totals barely move between matches; season stats are what people check.
+TIME_WINDOW_TTLS = {
+    "lifetime": 1800,
+    "season": 300,
+}
+
+_stats_cache = TTLCache(ttl=TIME_WINDOW_TTLS["season"], max_entries=2048, name="fn_stats")
+
+@metrics.timed_phase("fetch")
+@tracing.traced
+def fetch_fortnite_stats(username, account_type, api_key, time_window="lifetime"):
+    """Fetch Fortnite stats for a player.
+
+    Known players are looked up by account ID so the API doesn't have to
+    resolve the display name again; unknown names are remembered for
+    UNKNOWN_ACCOUNT_TTL seconds and answered locally. Successful responses
+    are cached per account and time window for TIME_WINDOW_TTLS seconds.
+
+    The API also answers 404 when an account has no matches in the window,
+    so only a lifetime 404 means the account doesn't exist. A 404 for a
+    known account in any other window comes back with "no_matches" set.
+    """
+    account_id = get_account_id(username, account_type)
+    if account_id is UNKNOWN_ACCOUNT:
+        return {"status": 404, "error": "the requested account does not exist"}
+    
+    if account_id:
+        cached = _stats_cache.get((account_id, time_window))
+        if cached is not None:
+            return cached
+        
+        data = fortnite_api_get(
+            f"/stats/br/v2/{urllib.parse.quote(account_id)}",
+            params={"timeWindow": time_window},
+            api_key=api_key
+        )
+        if not data or data.get("status") != 404:
+            _cache_stats(data, time_window)
+            return data
+        if time_window != "lifetime":
+            return dict(data, no_matches=True)
+        # The account is gone; forget it and retry by name
+        forget_account(username, account_type)
+    
+    data = fortnite_api_get(
         "/stats/br/v2",
-        params={"name": username, "accountType": account_type},
+        params={"name": username, "accountType": account_type, "timeWindow": time_window},
         api_key=api_key
     )
+    if data and data.get("status") == 200:
+        remember_account(username, account_type, data["data"]["account"]["id"])
+        _cache_stats(data, time_window)
+    elif data and data.get("status") == 404 and time_window == "lifetime":
+        remember_unknown_account(username, account_type)
+    return data
+
+
+def cached_fortnite_stats(username, account_type, time_window="lifetime"):
+    """(stats, age in seconds) from the last successful API response for this player, however old, or None"""
+    account_id = get_account_id(username, account_type)
+    if account_id is UNKNOWN_ACCOUNT:
+        return None
+    cached = None
+    if account_id:
+        cached = _last_good.get(
+            f"{FORTNITE_BASE}/stats/br/v2/{urllib.parse.quote(account_id)}", {"timeWindow": time_window}
+        )
+    if cached is None:
+        cached = _last_good.get(
+            f"{FORTNITE_BASE}/stats/br/v2", {"name": username, "accountType": account_type, "timeWindow": time_window}
+        )
+    if cached is None or cached[0].get("status") != 200:
+        return None
+    return cached
+
+
+def _cache_stats(data, time_window):
+    """Cache a successful stats response under its account ID and time window"""
+    if data and data.get("status") == 200:
+        account_id = data["data"]["account"]["id"]
+        _stats_cache.set((account_id, time_window), data, ttl=TIME_WINDOW_TTLS.get(time_window))
+
+
+# ============================
+# ACCOUNT ID CACHE
+# ============================
+ACCOUNT_CACHE_FILE = "fortnite_accounts.json"
+UNKNOWN_ACCOUNT_TTL = 600  # seconds
+
+# Returned by get_account_id for names the API recently said don't exist
+UNKNOWN_ACCOUNT = object()
+
+_accounts = None
+_accounts_lock = threading.Lock()
+# Misses only live in memory: random names must not grow the file
+_unknown_accounts = TTLCache(ttl=UNKNOWN_ACCOUNT_TTL, max_entries=4096, name="fn_unknown_accounts")
+
+def _account_key(username, account_type):
+    return f"{account_type}:{username.lower()}"
+
+def load_accounts():
+    """Load the name/platform -> account ID map from file (once per process)"""
+    global _accounts
+    if _accounts is None:
+        _accounts = {}
+        if os.path.exists(ACCOUNT_CACHE_FILE):
+            try:
+                with open(ACCOUNT_CACHE_FILE, 'r') as f:
+                    # Older files also held expiring "unknown" entries; only IDs are kept now
+                    _accounts = {key: entry for key, entry in json.load(f).items() if entry.get("id")}
+            except:
+                _accounts = {}
+    return _accounts
+
+def save_accounts():
+    """Save the account ID map to file"""
+    tmp_path = ACCOUNT_CACHE_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_accounts, f, indent=2)
+    os.replace(tmp_path, ACCOUNT_CACHE_FILE)
+
+def get_account_id(username, account_type):
+    """Get the cached account ID for a name, UNKNOWN_ACCOUNT, or None if not cached"""
+    key = _account_key(username, account_type)
+    with _accounts_lock:
+        entry = load_accounts().get(key)
+    if entry:
+        return entry["id"]
+    if _unknown_accounts.get(key) is not None:
+        return UNKNOWN_ACCOUNT
+    return None
+
+def remember_account(username, account_type, account_id):
+    """Map a name/platform to its account ID"""
+    key = _account_key(username, account_type)
+    _unknown_accounts.pop(key)
+    with _accounts_lock:
+        accounts = load_accounts()
+        if accounts.get(key, {}).get("id") == account_id:
+            return
+        accounts[key] = {"id": account_id}
+        save_accounts()
+
+def remember_unknown_account(username, account_type):
+    """Record that a name/platform doesn't exist, for UNKNOWN_ACCOUNT_TTL seconds"""
+    _unknown_accounts.set(_account_key(username, account_type), True)
+
+def forget_account(username, account_type):
+    """Drop a cached name/platform entry"""
+    key = _account_key(username, account_type)
+    _unknown_accounts.pop(key)
+    with _accounts_lock:
+        if load_accounts().pop(key, None) is not None:
+            save_accounts()
+
+
+# ============================
+# STARTUP
+# ============================
+def warm_up(api_key=None):
+    """Open a pooled API connection and load the account ID cache before the first command"""
+    cassette.warm_up(FORTNITE_BASE)
+    load_accounts()
 
 
 # ============================
 # EMBED BUILDERS
 # ============================
-def build_fortnite_embed(data):
-    """Build embed for Fortnite player stats"""
+@metrics.timed_phase("render")
+@tracing.traced
+def build_fortnite_embed(data, season_data=None, show_inputs=False, time_window="lifetime"):
+    """Build embed for Fortnite player stats
+
+    season_data adds this season's overall stats next to the lifetime ones,
+    and show_inputs adds the keyboard & mouse / controller / touch breakdown.
+    """
     account = data["data"]["account"]
     stats = data["data"]["stats"]
     battle_pass = data["data"].get("battlePass", {})
     
     # Get overall stats
-    overall = stats["all"]["overall"]
+    # Season windows have no "all" block until the player has a match this season
+    all_modes = stats.get("all") or {}
+    overall = all_modes.get("overall") or {}
     
     # Calculate stats
     matches = overall.get("matches", 0)
@@ -58,10 +271,10 @@ def build_fortnite_embed(data):
     top3 = overall.get("top3", 0)
     
     # Get mode-specific stats
-    solo = stats["all"].get("solo", {})
-    duo = stats["all"].get("duo", {})
-    squad = stats["all"].get("squad", {})
-    ltm = stats["all"].get("ltm", {})
+    solo = all_modes.get("solo") or {}
+    duo = all_modes.get("duo") or {}
+    squad = all_modes.get("squad") or {}
+    ltm = all_modes.get("ltm") or {}
     
     embed = discord.Embed(
         title=f"🎮 {account['name']} — Fortnite Battle Royale",
@@ -70,7 +283,7 @@ def build_fortnite_embed(data):
     )
     
     embed.add_field(
-        name="📊 OVERALL STATS",
+        name="📊 SEASON STATS" if time_window == "season" else "📊 OVERALL STATS",
         value=(
             f"**Matches:** {matches:,}\n"
             f"**Wins:** {wins:,} ({winrate:.1f}%)\n"
@@ -132,11 +345,64 @@ def build_fortnite_embed(data):
             inline=True
         )
     
+    # Season vs lifetime, side by side
+    if season_data and (season_data.get("status") == 200 or season_data.get("no_matches")):
+        if season_data.get("no_matches"):
+            season_value = "No matches this season yet"
+        else:
+            season = (season_data["data"]["stats"].get("all") or {}).get("overall") or {}
+            season_value = _format_window_stats(season)
+        embed.add_field(
+            name="🗓️ THIS SEASON",
+            value=season_value,
+            inline=True
+        )
+        embed.add_field(
+            name="♾️ LIFETIME",
+            value=_format_window_stats(overall),
+            inline=True
+        )
+    
+    # Input type breakdown
+    if show_inputs:
+        input_lines = []
+        for key, label in INPUT_TYPES:
+            input_overall = (stats.get(key) or {}).get("overall") or {}
+            if input_overall.get("matches", 0) > 0:
+                input_lines.append(
+                    f"**{label}:** {input_overall.get('matches', 0):,} matches • "
+                    f"{input_overall.get('wins', 0):,} wins • "
+                    f"{input_overall.get('kd', 0):.2f} K/D • "
+                    f"{input_overall.get('winRate', 0):.1f}% WR"
+                )
+        
+        embed.add_field(
+            name="🕹️ BY INPUT",
+            value="\n".join(input_lines) if input_lines else "No input breakdown available",
+            inline=False
+        )
+    
     embed.set_footer(text=f"Account ID: {account['id']}")
     
     return embed
 
 
+INPUT_TYPES = [
+    ("keyboardMouse", "⌨️ Keyboard & Mouse"),
+    ("gamepad", "🎮 Controller"),
+    ("touch", "📱 Touch"),
+]
+
+def _format_window_stats(overall):
+    """Format one time window's overall stats for a side-by-side field"""
+    return (
+        f"**Matches:** {overall.get('matches', 0):,}\n"
+        f"**Wins:** {overall.get('wins', 0):,} ({overall.get('winRate', 0):.1f}%)\n"
+        f"**Kills:** {overall.get('kills', 0):,}\n"
+        f"**K/D Ratio:** {overall.get('kd', 0):.2f}"
+    )
+
+
 def calculate_win_probability(player1_stats, player2_stats):
     """Calculate win probability based on multiple factors"""
     
@@ -186,6 +452,8 @@ def calculate_win_probability(player1_stats, player2_stats):
     return round(p1_win_chance, 1), round(p2_win_chance, 1)
 
 
+@metrics.timed_phase("render")
+@tracing.traced
 def build_fortnite_comparison_embed(data1, data2, platform1_name, platform2_name):
     """Build a comparison embed for two Fortnite players"""
     
@@ -318,6 +586,54 @@ def build_fortnite_comparison_embed(data1, data2, platform1_name, platform2_name
     return embed
 
 
+# ============================
+# IMAGE CARDS
+# ============================
+# Specs for cards.render(); see cards.py for the format
+CARD_ACCENT = [155, 89, 182]
+
+def _overall_stats(data):
+    return ((data["data"]["stats"].get("all") or {}).get("overall")) or {}
+
+def _card_player(data, subtitle):
+    overall = _overall_stats(data)
+    return {
+        "name": data["data"]["account"].get("name", "Unknown"),
+        "subtitle": subtitle,
+        "stats": [
+            ["Wins", f"{overall.get('wins', 0):,}"],
+            ["Win rate", f"{overall.get('winRate', 0):.1f}%"],
+            ["K/D", f"{overall.get('kd', 0):.2f}"],
+            ["Kills", f"{overall.get('kills', 0):,}"],
+            ["Matches", f"{overall.get('matches', 0):,}"],
+            ["Top 10", f"{overall.get('top10', 0):,}"],
+        ],
+    }
+
+def build_fortnite_card(data, time_window="lifetime"):
+    """Image card for a player profile"""
+    level = (data["data"].get("battlePass") or {}).get("level")
+    subtitle = f"{time_window.title()} • Battle Pass {level}" if level is not None else time_window.title()
+    return {
+        "title": "FORTNITE",
+        "accent": CARD_ACCENT,
+        "players": [_card_player(data, subtitle)],
+        "bar": None,
+        "icons": [],
+    }
+
+def build_fortnite_comparison_card(data1, data2, platform1_name, platform2_name):
+    """Image card for a 1v1 comparison"""
+    p1_chance, p2_chance = calculate_win_probability(_overall_stats(data1), _overall_stats(data2))
+    return {
+        "title": "FORTNITE 1v1",
+        "accent": CARD_ACCENT,
+        "players": [_card_player(data1, platform1_name), _card_player(data2, platform2_name)],
+        "bar": {"label": "Win chance", "values": [p1_chance, p2_chance]},
+        "icons": [],
+    }
+
+
 # ============================
 # TEST FUNCTION
 # ============================
@@ -0,0 +1,126 @@
+import json
+import re
+import time
+
+import cassette
+from cache import TTLCache
+
+# ============================
+# SETTINGS
+# ============================
+# Successful responses are kept per URL for as long as the API's Cache-Control
+# max-age allows, then revalidated with If-None-Match / If-Modified-Since so an
+# unchanged profile comes back as a body-less 304 instead of being re-sent.
+REVALIDATE_WINDOW = 3600  # seconds a stale response is kept around for revalidation
+RESPONSE_CACHE_ENTRIES = 512
+# Each game separately keeps the last good body per request for this long, so a
+# slow lookup can answer with something whatever headers the API sent
+LAST_GOOD_TTL = 24 * 3600
+LAST_GOOD_ENTRIES = 1024  # per game
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*(?:s-)?max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+_responses = TTLCache(ttl=REVALIDATE_WINDOW, max_entries=RESPONSE_CACHE_ENTRIES, name="http_responses")
+
+
+class _Entry:
+    __slots__ = ("response", "stored_at", "expires_at", "etag", "last_modified")
+
+    def __init__(self, response, ttl):
+        # A detached copy, so the pooled connection behind the original is never held
+        self.response = cassette.CassetteResponse(response.status_code, dict(response.headers), response.text)
+        self.stored_at = time.time()
+        self.expires_at = self.stored_at + ttl
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+
+
+def _key(url, params):
+    return (url, tuple(sorted((params or {}).items())))
+
+
+def max_age(headers, default=0):
+    """Seconds a response may be reused for, from Cache-Control (minus Age)"""
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return default
+    try:
+        age = int(headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+
+# ============================
+# LOOKUP / UPDATE
+# ============================
+def fresh(url, params=None):
+    """Return the cached response if it's still within its max-age, else None"""
+    entry = _responses.get(_key(url, params))
+    if entry is not None and entry.expires_at > time.time():
+        return entry.response
+    return None
+
+
+def conditional_headers(url, params=None, headers=None):
+    """(headers plus If-None-Match / If-Modified-Since for a stale cached response,
+    that cached entry or None). Pass the entry on to update() with the response."""
+    headers = dict(headers or {})
+    entry = _responses.get(_key(url, params))
+    if entry is None or not (entry.etag or entry.last_modified):
+        return headers, None
+    if entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+    return headers, entry
+
+
+def update(url, params, response, revalidated=None, default_ttl=0):
+    """Record a fresh upstream response; returns the response callers should use.
+    A 304 refreshes the cached response's lifetime and returns that response.
+    revalidated is the entry from conditional_headers(): the 304 answers for it
+    even if the cache has evicted it since."""
+    key = _key(url, params)
+    if response.status_code == 304:
+        entry = revalidated or _responses.get(key)
+        if entry is None:
+            return response
+        entry.stored_at = time.time()
+        entry.expires_at = entry.stored_at + max_age(response.headers, default_ttl)
+        _responses.set(key, entry, ttl=max(REVALIDATE_WINDOW, entry.expires_at - time.time()))
+        return entry.response
+    if response.status_code == 200:
+        ttl = max_age(response.headers, default_ttl)
+        entry = _Entry(response, ttl)
+        if ttl > 0 or entry.etag or entry.last_modified:
+            _responses.set(key, entry, ttl=max(REVALIDATE_WINDOW, ttl))
+        else:
+            _responses.pop(key)
+    return response
+
+
+# ============================
+# LAST GOOD RESPONSES
+# ============================
+class LastGood:
+    """The last successful response body per request, however it was cached.
+    For answering with something while a fresh request is still slow."""
+
+    def __init__(self, name, max_entries=LAST_GOOD_ENTRIES):
+        self._bodies = TTLCache(ttl=LAST_GOOD_TTL, max_entries=max_entries, name=name)
+
+    def remember(self, url, params, response):
+        # Kept as text: a parsed player profile takes several times the memory
+        self._bodies.set(_key(url, params), (response.text, time.time()))
+
+    def get(self, url, params=None):
+        """(parsed body, seconds since the API sent or confirmed it), however old, or None"""
+        entry = self._bodies.get(_key(url, params))
+        if entry is None:
+            return None
+        text, stored_at = entry
+        return json.loads(text), time.time() - stored_at
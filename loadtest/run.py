@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import NOT_FOUND_MARKER, StubConfig, start_stub_server
+
+
+# ============================
+# FAKE DISCORD INTERACTIONS
+# ============================
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def defer(self, **kwargs):
+        self._interaction.deferred = True
+
+    async def send_message(self, content=None, **kwargs):
+        self._interaction.messages.append(content or kwargs.get("embed"))
+
+    async def edit_message(self, content=None, **kwargs):
+        self._interaction.messages.append(content or kwargs.get("embed"))
+
+
+class FakeMessage:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def edit(self, content=None, **kwargs):
+        self._interaction.messages.append(content or kwargs.get("embed"))
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self._interaction.messages.append(content or kwargs.get("embed"))
+        return FakeMessage(self._interaction)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"loadtest{user_id}"
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the command callbacks in main_bot.py"""
+
+    def __init__(self, user_id, guild_id):
+        self.user = FakeUser(user_id)
+        self.guild_id = guild_id
+        self.channel_id = guild_id
+        self.deferred = False
+        self.messages = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+# ============================
+# WORKLOAD
+# ============================
+def build_workload(main_bot, player_pool, not_found_rate):
+    """Return a function producing (command name, coroutine factory) for one random call"""
+    from discord import app_commands
+
+    epic = app_commands.Choice(name="Epic", value="epic")
+    crown = app_commands.Choice(name="Clash Royale", value="clashroyale")
+    brawl = app_commands.Choice(name="Brawl Stars", value="brawlstars")
+    alphabet = "0289PYLQGRJCUV"
+    tags = ["#" + "".join(random.choice(alphabet[1:]) for _ in range(8)) for _ in range(player_pool)]
+    names = [f"player{i}" for i in range(player_pool)]
+
+    def tag():
+        return f"#8{NOT_FOUND_MARKER}QQ" if random.random() < not_found_rate else random.choice(tags)
+
+    def name():
+        return f"x{NOT_FOUND_MARKER}" if random.random() < not_found_rate else random.choice(names)
+
+    commands = [
+        ("clashroyale", lambda i: main_bot.clashroyale_cmd.callback(i, tag())),
+        ("brawlstars", lambda i: main_bot.brawlstars_cmd.callback(i, tag())),
+        ("fortnite", lambda i: main_bot.fortnite_cmd.callback(i, name(), epic)),
+        ("compare", lambda i: main_bot.compare_cmd.callback(i, random.choice([crown, brawl]), tag(), tag())),
+        ("fncompare", lambda i: main_bot.fn_compare.callback(i, name(), epic, name(), epic)),
+    ]
+    return lambda: random.choice(commands)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def drive(next_call, total, concurrency, guilds, users):
+    """Run total command calls with at most concurrency in flight"""
+    latencies = {}
+    failures = {}
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(next_call())
+
+    async def worker():
+        while True:
+            try:
+                command, make_call = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            interaction = FakeInteraction(random.randrange(users), random.randrange(guilds))
+            start = time.perf_counter()
+            try:
+                await make_call(interaction)
+            except Exception as e:
+                failures[command] = failures.get(command, 0) + 1
+                print(f"❌ /{command} raised {e!r}")
+            latencies.setdefault(command, []).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, failures
+
+
+def report(elapsed, latencies, failures, upstream_counts):
+    total = sum(len(v) for v in latencies.values())
+    print(f"\n{'='*72}")
+    print("📈 LOAD TEST RESULTS")
+    print(f"{'='*72}\n")
+    print(f"Commands: {total:,} in {elapsed:.2f}s → {total / elapsed:,.1f} commands/s\n")
+    print(f"{'command':14} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    everything = []
+    for command in sorted(latencies):
+        values = sorted(latencies[command])
+        everything.extend(values)
+        print(
+            f"{command:14} {len(values):>7,} {percentile(values, 0.5) * 1000:>9.1f} {percentile(values, 0.9) * 1000:>9.1f} "
+            f"{percentile(values, 0.99) * 1000:>9.1f} {values[-1] * 1000:>9.1f} {failures.get(command, 0):>7}"
+        )
+    everything.sort()
+    print(
+        f"{'ALL':14} {len(everything):>7,} {percentile(everything, 0.5) * 1000:>9.1f} {percentile(everything, 0.9) * 1000:>9.1f} "
+        f"{percentile(everything, 0.99) * 1000:>9.1f} {everything[-1] * 1000 if everything else 0:>9.1f} {sum(failures.values()):>7}"
+    )
+    print("\n📡 Upstream calls:")
+    for key in sorted(upstream_counts):
+        print(f"  {key}: {upstream_counts[key]:,}")
+    print(f"  total: {sum(upstream_counts.values()):,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive main_bot.py command callbacks against stub game APIs")
+    parser.add_argument("--requests", type=int, default=500, help="Total command invocations")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--player-pool", type=int, default=50, help="Distinct players to pick from (smaller = more cache hits)")
+    parser.add_argument("--not-found-rate", type=float, default=0.05)
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--stub-url", help="Use an already running stub_server.py instead of starting one")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=25)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--fixture-size", choices=["small", "typical", "huge"], default="typical")
+    parser.add_argument("--max-age", type=int, default=60, help="Cache-Control max-age the stub sends")
+    args = parser.parse_args()
+
+    base_url = args.stub_url
+    if not base_url:
+        config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.fixture_size, args.max_age)
+        _, base_url = start_stub_server(config)
+
+    # Must be set before main_bot (and the game modules) are imported
+    os.environ["CLASH_ROYALE_API_BASE"] = f"{base_url}/clashroyale/v1"
+    os.environ["BRAWL_STARS_API_BASE"] = f"{base_url}/brawlstars/v1"
+    os.environ["FORTNITE_API_BASE"] = f"{base_url}/fortnite/v2"
+    for key in ("DISCORD_TOKEN", "CLASH_ROYALE_API_KEY", "BRAWL_STARS_API_KEY", "FORTNITE_API_KEY"):
+        os.environ[key] = "loadtest"
+    # Measure the bot, not its quotas (export QUOTA_* yourself to load test those)
+    for key in ("QUOTA_USER_PER_MINUTE", "QUOTA_GUILD_PER_MINUTE", "QUOTA_GLOBAL_PER_MINUTE"):
+        os.environ.setdefault(key, "1e9")
+    # Keep registration/account files out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix="bot-loadtest-"))
+
+    import main_bot
+
+    next_call = build_workload(main_bot, args.player_pool, args.not_found_rate)
+    elapsed, latencies, failures = asyncio.run(
+        drive(next_call, args.requests, args.concurrency, args.guilds, args.users)
+    )
+
+    with urllib.request.urlopen(f"{base_url}/__stats") as r:
+        upstream_counts = json.load(r)
+    report(elapsed, latencies, failures, upstream_counts)
+
+
+if __name__ == "__main__":
+    main()
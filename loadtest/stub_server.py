@@ -0,0 +1,185 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================
+# STUB GAME APIS
+# ============================
+# Emulates the Clash Royale, Brawl Stars and fortnite-api.com endpoints the
+# bot uses, serving the benchmark fixtures so no real API quota is spent:
+#   /clashroyale/v1/players/{tag}, /cards
+#   /brawlstars/v1/players/{tag}, /clubs/{tag}, /clubs/{tag}/members, /brawlers
+#   /fortnite/v2/stats/br/v2?name=..., /fortnite/v2/stats/br/v2/{accountId}
+# 200s carry an ETag and Cache-Control max-age; a matching If-None-Match gets a 304.
+# GET /__stats returns request counts per game and status.
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT_DIR, "benchmarks", "fixtures")
+
+# Names/tags containing this are answered with 404 (or 403 for Fortnite "private")
+NOT_FOUND_MARKER = "2222"
+PRIVATE_MARKER = "private"
+
+
+def _load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StubConfig:
+    """Behaviour knobs shared by every request handler"""
+
+    def __init__(self, latency_ms=50, jitter_ms=25, error_rate=0.0, rate_limit_rate=0.0, fixture_size="typical", max_age=60):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_age = max_age  # Cache-Control max-age on 200s; every 200 also carries an ETag
+        self.clash_royale_player = _load_fixture(f"clash_royale_{fixture_size}")
+        self.brawl_stars_player = _load_fixture(f"brawl_stars_{fixture_size}")
+        self.fortnite_stats = _load_fixture(f"fortnite_{fixture_size}")
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def count(self, game, status):
+        with self.lock:
+            key = f"{game} {status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    config = None  # set by start_stub_server
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(url.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+
+        if path == "/__stats":
+            with self.config.lock:
+                self._send(200, json.dumps(self.config.counts).encode("utf-8"))
+            return
+
+        game = path.strip("/").split("/")[0]
+        config = self.config
+        delay = max(0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms))
+        time.sleep(delay / 1000)
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            status, body = 429, {"reason": "requestThrottled", "message": "Request was throttled"}
+        elif roll < config.rate_limit_rate + config.error_rate:
+            status, body = 503, {"reason": "inMaintenance"}
+        elif game == "clashroyale":
+            status, body = self._clash_royale(path)
+        elif game == "brawlstars":
+            status, body = self._brawl_stars(path)
+        elif game == "fortnite":
+            status, body = self._fortnite(path, params)
+        else:
+            status, body = 404, {"reason": "notFound"}
+
+        payload = json.dumps(body).encode("utf-8")
+        headers = {}
+        if status == 200:
+            etag = '"%s"' % hashlib.md5(payload).hexdigest()
+            headers = {"ETag": etag, "Cache-Control": f"max-age={config.max_age}"}
+            if self.headers.get("If-None-Match") == etag:
+                status, payload = 304, b""
+        config.count(game, status)
+        self._send(status, payload, headers)
+
+    def _clash_royale(self, path):
+        if path.endswith("/cards"):
+            cards = self.config.clash_royale_player.get("cards", [])
+            fields = ("name", "id", "maxLevel", "maxEvolutionLevel", "elixirCost", "rarity", "iconUrls")
+            return 200, {"items": [{k: card[k] for k in fields if k in card} for card in cards], "supportItems": []}
+        tag = path.rsplit("/", 1)[-1]
+        if NOT_FOUND_MARKER in tag:
+            return 404, {"reason": "notFound"}
+        return 200, dict(self.config.clash_royale_player, tag=tag, name=f"CR {tag}")
+
+    def _brawl_stars(self, path):
+        parts = path.strip("/").split("/")
+        if parts[2] == "brawlers":
+            brawlers = self.config.brawl_stars_player.get("brawlers", [])
+            fields = ("id", "name", "starPowers", "gadgets")
+            return 200, {"items": [{k: b[k] for k in fields if k in b} for b in brawlers], "paging": {"cursors": {}}}
+        tag = parts[3] if len(parts) > 3 else ""
+        if NOT_FOUND_MARKER in tag:
+            return 404, {"reason": "notFound"}
+        player = self.config.brawl_stars_player
+        members = [
+            {"tag": f"#{i:08d}", "name": f"Member {i}", "role": "president" if i == 0 else "member", "trophies": 30000 - i * 500}
+            for i in range(30)
+        ]
+        if parts[2] == "clubs" and parts[-1] == "members":
+            return 200, {"items": members, "paging": {"cursors": {}}}
+        if parts[2] == "clubs":
+            return 200, {"tag": tag, "name": f"Club {tag}", "type": "open", "trophies": 600000, "requiredTrophies": 10000, "members": members}
+        return 200, dict(player, tag=tag, name=f"BS {tag}", club={"tag": "#2YQ0PUJ", "name": "Stub Club"})
+
+    def _fortnite(self, path, params):
+        name = params.get("name") or path.rsplit("/", 1)[-1]
+        if NOT_FOUND_MARKER in name:
+            return 404, {"status": 404, "error": "the requested account does not exist"}
+        if PRIVATE_MARKER in name.lower():
+            return 403, {"status": 403, "error": "the requested account's stats are not public"}
+        # Name and account-ID lookups for the same player must agree on the ID
+        account_id = name if "name" not in params else hashlib.md5(name.lower().encode()).hexdigest()
+        data = dict(self.config.fortnite_stats["data"], account={"id": account_id, "name": params.get("name", f"FN {account_id[:6]}")})
+        return 200, {"status": 200, "data": data}
+
+    def _send(self, status, payload, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(config, port=0, host="127.0.0.1"):
+    """Start the stub in a daemon thread; returns (server, base_url)"""
+    handler = type("StubHandler", (_StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-api", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub for the Clash Royale, Brawl Stars and Fortnite APIs")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=25)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--fixture-size", choices=["small", "typical", "huge"], default="typical")
+    parser.add_argument("--max-age", type=int, default=60, help="Cache-Control max-age sent with every 200")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.fixture_size, args.max_age)
+    server, base_url = start_stub_server(config, args.port)
+    print(f"🧪 Stub APIs listening on {base_url}")
+    print(f"   CLASH_ROYALE_API_BASE={base_url}/clashroyale/v1")
+    print(f"   BRAWL_STARS_API_BASE={base_url}/brawlstars/v1")
+    print(f"   FORTNITE_API_BASE={base_url}/fortnite/v2")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+
+# ============================
+# SETTINGS
+# ============================
+LOOP_LAG_INTERVAL = 0.1  # seconds between event loop heartbeats
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250")) / 1000
+RECENT_STALLS_SIZE = 50
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOOP_LAG_SECONDS = metrics.Histogram(
+    "bot_event_loop_lag_seconds", "How late the event loop ran a scheduled heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_STALLS = metrics.Counter(
+    "bot_event_loop_stalls_total", "Times the event loop was blocked past the threshold", ["command", "call_site"]
+)
+
+
+# ============================
+# WATCHDOG
+# ============================
+class LoopWatchdog:
+    """Measures event loop lag and captures what blocked it.
+
+    A coroutine on the loop records a heartbeat every LOOP_LAG_INTERVAL
+    seconds. A helper thread watches the heartbeat and, once it is more than
+    threshold seconds old, grabs the loop thread's stack while it is still
+    stuck, so the log shows the command and call site that blocked.
+    """
+
+    def __init__(self, threshold=LOOP_LAG_THRESHOLD, interval=LOOP_LAG_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.recent_stalls = collections.deque(maxlen=RECENT_STALLS_SIZE)
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._reported_beat = None
+        self._task = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start watching the running event loop (call from inside it)"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            LOOP_LAG_SECONDS.observe(max(0.0, now - expected))
+            self._last_beat = now
+
+    def _watch(self):
+        while not self._stopping.wait(self.interval / 2):
+            beat = self._last_beat
+            stalled_for = time.monotonic() - beat
+            # Report each stall once, while the loop is still stuck in it
+            if stalled_for > self.threshold and self._reported_beat != beat:
+                self._reported_beat = beat
+                self._record_stall(stalled_for)
+
+    def _record_stall(self, stalled_for):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        command, call_site = _blame(stack, _running_command(frame))
+
+        stall = {
+            "time": time.time(),
+            "stalled_ms": round(stalled_for * 1000),
+            "command": command,
+            "call_site": call_site,
+            "stack": traceback.format_list(stack),
+        }
+        self.recent_stalls.append(stall)
+        LOOP_STALLS.inc(command=command, call_site=call_site)
+        print(
+            f"⚠️ EVENT LOOP BLOCKED for {stall['stalled_ms']}ms+ "
+            f"in /{command} at {call_site}\n" + "".join(stall["stack"][-8:])
+        )
+
+
+def _running_command(frame):
+    """Name of the slash command whose metrics.timed_command wrapper is on the stack, or None"""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "wrapper" and code.co_filename == metrics.__file__ and "command" in code.co_freevars:
+            return frame.f_locals.get("command")
+        frame = frame.f_back
+    return None
+
+
+def _blame(stack, command=None):
+    """Find the slash command and innermost project call site in a stack.
+    Without a known command, the innermost main_bot.py function stands in for it
+    (never its <module> frame, which is just bot.run() when started as a script)."""
+    call_site = "unknown"
+    innermost = None
+    for entry in stack:
+        if not entry.filename.startswith(PROJECT_DIR) or "site-packages" in entry.filename:
+            continue
+        filename = os.path.basename(entry.filename)
+        call_site = f"{filename}:{entry.lineno} {entry.name}"
+        if filename == "main_bot.py" and entry.name != "<module>":
+            innermost = entry.name
+    return command or innermost or "none", call_site
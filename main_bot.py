@@ -1,13 +1,61 @@
+if __name__ == "__main__":
+    # Run as the importable main_bot module, from run_bot.py (see there why)
+    import os
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_bot.py"), run_name="__main__")
+    raise SystemExit
+
+import time
+
+# Measured from the very top so module loading shows up in the startup report
+STARTUP_STARTED = time.perf_counter()
+
 import discord
 from discord.ext import commands
 from discord import app_commands
+import asyncio
+import hashlib
+import importlib.util
+import io
+import json
 import os
+import sys
+import threading
+from typing import Optional
 from dotenv import load_dotenv
 
-# Import game modules
-import clash_royale
-import fortnite
-import brawl_stars
+import cards
+import digest
+import metrics
+import quotas
+import reference_data
+import registrations
+import scheduler
+import tracing
+import watch
+from loop_watchdog import LoopWatchdog
+from supercell import InvalidTagError, canonicalize_tag
+
+
+# ============================
+# GAME MODULES (LAZY)
+# ============================
+def lazy_import(name):
+    """Import a module whose code only runs on first attribute access"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+# Only games with an API key are ever executed; see GAMES below
+clash_royale = lazy_import("clash_royale")
+fortnite = lazy_import("fortnite")
+brawl_stars = lazy_import("brawl_stars")
 
 # ============================
 # LOAD ENVIRONMENTS
@@ -17,21 +65,16 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 CLASH_ROYALE_API_KEY = os.getenv("CLASH_ROYALE_API_KEY")
 FORTNITE_API_KEY = os.getenv("FORTNITE_API_KEY")
 BRAWL_STARS_API_KEY = os.getenv("BRAWL_STARS_API_KEY")
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+DEV_GUILD_ID = os.getenv("DEV_GUILD_ID")  # sync commands to this guild only (instant updates while developing)
 
 if not DISCORD_TOKEN:
     print("❌ No DISCORD_TOKEN found.")
     exit(1)
 
-if not CLASH_ROYALE_API_KEY:
-    print("❌ No CLASH_ROYALE_API_KEY found.")
-    exit(1)
-
-if not FORTNITE_API_KEY:
-    print("❌ No FORTNITE_API_KEY found.")
-    exit(1)
-
-if not BRAWL_STARS_API_KEY:
-    print("❌ No BRAWL_STARS_API_KEY found.")
+if not (CLASH_ROYALE_API_KEY or FORTNITE_API_KEY or BRAWL_STARS_API_KEY):
+    print("❌ No game API keys found. Set at least one of CLASH_ROYALE_API_KEY, BRAWL_STARS_API_KEY, FORTNITE_API_KEY.")
     exit(1)
 
 # ============================
@@ -40,66 +83,217 @@ if not BRAWL_STARS_API_KEY:
 intents = discord.Intents.default()
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+loop_watchdog = LoopWatchdog()
+
+
+async def defer(interaction):
+    """Defer the interaction response, timed as the command's "defer" phase"""
+    with metrics.phase("defer"), tracing.span("defer"):
+        await interaction.response.defer()
+
+
+async def send(interaction, *args, **kwargs):
+    """Send a followup message, timed as the command's "followup" phase"""
+    with metrics.phase("followup"), tracing.span("followup.send"):
+        return await interaction.followup.send(*args, **kwargs)
+
+
+async def send_embed(interaction, embed, card=None, content=None, view=None):
+    """Send an embed, with its image card (a cards.py spec) rendered in as the embed image"""
+    png = await cards.render(card)
+    extra = {} if content is None else {"content": content}
+    if view is not None:
+        extra["view"] = view
+    if png is None:
+        return await send(interaction, embed=embed, **extra)
+    embed.set_image(url=f"attachment://{cards.CARD_FILENAME}")
+    return await send(interaction, embed=embed, file=discord.File(io.BytesIO(png), filename=cards.CARD_FILENAME), **extra)
+
+
+async def edit_embed(message, embed, card=None, content=None, view=None):
+    """Replace a sent message's text, embed, image card and view"""
+    png = await cards.render(card)
+    attachments = []
+    if png is not None:
+        embed.set_image(url=f"attachment://{cards.CARD_FILENAME}")
+        attachments.append(discord.File(io.BytesIO(png), filename=cards.CARD_FILENAME))
+    with metrics.phase("followup"), tracing.span("followup.edit"):
+        return await message.edit(content=content, embed=embed, attachments=attachments, view=view)
+
 
 # ============================
-# BRAWL STARS COMMANDS
+# RESPONSE DEADLINES
 # ============================
-@bot.tree.command(name="brawlstars", description="Get Brawl Stars stats")
-@app_commands.describe(
-    player="Player tag (e.g., #Q8YYOJU) OR registered username"
-)
-async def brawlstars_cmd(interaction: discord.Interaction, player: str):
-    await interaction.response.defer()
+# Lookups answer within RESPONSE_DEADLINE_SECONDS. When the game API is slower,
+# the last cached stats are shown, marked as stale, and swapped for fresh ones
+# when they arrive. After FETCH_GIVE_UP_SECONDS the lookup gives up and its
+# requests still waiting for an API slot are cancelled.
+RESPONSE_DEADLINE_SECONDS = float(os.getenv("RESPONSE_DEADLINE_SECONDS", "2.5"))
+FETCH_GIVE_UP_SECONDS = 25
+
+
+def cached_together(*entries):
+    """Combine game modules' cached_*_stats() results: ([data, ...], oldest age), or None if any is missing"""
+    if any(entry is None for entry in entries):
+        return None
+    return [data for data, _ in entries], max(age for _, age in entries)
+
+
+def _with_view(result):
+    """(embed, card, view) from a render() result, which may leave out the view"""
+    return result if len(result) == 3 else (*result, None)
+
+
+async def respond_by_deadline(interaction, fetches, cached, render):
+    """Send render(fresh results), falling back to cached data if the fetches miss the deadline.
+
+    fetches: blocking zero-argument callables, run concurrently in worker threads
+    cached: returns ([data per fetch], age in seconds) from cache, or None
+    render: turns [data per fetch] into (embed, card), (embed, card, view) or an error message
+    """
+    cancel = threading.Event()
     
-    # Check if it's a registered username first
-    player_tag = brawl_stars.get_player_tag(player)
+    def run(fetch):
+        with scheduler.cancellable(cancel):
+            return fetch()
     
-    # If not registered, treat as player tag
-    if not player_tag:
-        player_tag = player
-        # Ensure the tag starts with #
-        if not player_tag.startswith("#"):
-            player_tag = "#" + player_tag
+    tasks = [asyncio.create_task(asyncio.to_thread(run, fetch)) for fetch in fetches]
+    _, pending = await asyncio.wait(tasks, timeout=RESPONSE_DEADLINE_SECONDS)
     
-    data = brawl_stars.fetch_brawl_stars_stats(player_tag, BRAWL_STARS_API_KEY)
+    message = None
+    if pending:
+        stale = cached()
+        result = render(stale[0]) if stale else None
+        if isinstance(result, tuple):
+            fetched_at = int(time.time() - stale[1])
+            embed, card, view = _with_view(result)
+            message = await send_embed(
+                interaction, embed, card,
+                content=f"⏳ The game API is slow, so these are the stats from <t:{fetched_at}:R>. Updating…",
+                view=view
+            )
+        
+        with metrics.phase("refresh"), tracing.span("refresh"):
+            _, pending = await asyncio.wait(pending, timeout=FETCH_GIVE_UP_SECONDS - RESPONSE_DEADLINE_SECONDS)
+        if pending:
+            cancel.set()
+            for task in pending:
+                task.cancel()
+            if message is None:
+                await send(interaction, "⌛ The game API is too slow right now. Please try again in a minute.")
+            else:
+                await message.edit(content=f"⚠️ Couldn't get fresh stats; these are from <t:{fetched_at}:R>.")
+            return
     
-    if not data:
-        await interaction.followup.send(
-            f"❌ Could not find Brawl Stars player `{player_tag}`.\n"
-            f"💡 Make sure the tag is correct or use `/bsregister` to save your tag!"
+    result = render([task.result() for task in tasks])
+    if message is None:
+        if isinstance(result, tuple):
+            embed, card, view = _with_view(result)
+            await send_embed(interaction, embed, card, view=view)
+        else:
+            await send(interaction, result)
+    elif isinstance(result, tuple):
+        embed, card, view = _with_view(result)
+        await edit_embed(message, embed, card, view=view)
+    else:
+        # Cached stats beat an error for a player we know exists
+        await message.edit(content=f"⚠️ Couldn't get fresh stats; these are from <t:{fetched_at}:R>.")
+
+
+def forget_digest_player(game_module, name, player_tag):
+    """Drop an unregistered tag from every guild's digest, unless another username still has it"""
+    if player_tag not in game_module.load_registrations().values():
+        digest.remove_players(name, [player_tag])
+
+
+def player_choices(game_module, interaction, current):
+    """Autocomplete choices from a game's registered usernames and recently looked-up tags"""
+    return [
+        app_commands.Choice(name=label, value=value)
+        for label, value in game_module.player_suggestions(current, interaction.guild_id)
+    ]
+
+
+# ============================
+# BRAWL STARS COMMANDS
+# ============================
+@app_commands.command(name="brawlstars", description="Get Brawl Stars stats")
+@app_commands.describe(
+    player="Player tag (e.g., #Q8YY0JU) OR registered username"
+)
+@quotas.limit_command("brawlstars")
+@metrics.timed_command("brawlstars")
+@tracing.trace_command("brawlstars")
+async def brawlstars_cmd(interaction: discord.Interaction, player: str):
+    # Registered username or player tag; impossible tags are rejected locally
+    try:
+        player_tag = brawl_stars.resolve_player_tag(player)
+    except InvalidTagError as e:
+        await interaction.response.send_message(
+            f"❌ {e}\n💡 Use `/bsregister` to save your tag!", ephemeral=True
         )
         return
     
-    embed = brawl_stars.build_brawl_stars_embed(data)
-    await interaction.followup.send(embed=embed)
+    await defer(interaction)
+    
+    def render(results):
+        data = results[0]
+        if not data:
+            return (
+                f"❌ Could not find Brawl Stars player `{player_tag}`.\n"
+                f"💡 Make sure the tag is correct or use `/bsregister` to save your tag!"
+            )
+        brawl_stars.remember_lookup(interaction.guild_id, data)
+        return brawl_stars.build_brawl_stars_embed(data), brawl_stars.build_brawl_stars_card(data)
+    
+    await respond_by_deadline(
+        interaction,
+        [lambda: brawl_stars.fetch_brawl_stars_stats(player_tag, BRAWL_STARS_API_KEY)],
+        lambda: cached_together(brawl_stars.cached_brawl_stars_stats(player_tag)),
+        render
+    )
+
+
+@brawlstars_cmd.autocomplete("player")
+async def brawlstars_player_autocomplete(interaction: discord.Interaction, current: str):
+    return player_choices(brawl_stars, interaction, current)
 
 
-@bot.tree.command(name="bsregister", description="Register your Brawl Stars player tag")
+@app_commands.command(name="bsregister", description="Register your Brawl Stars player tag")
 @app_commands.describe(
     username="Your username (used for quick lookups)",
-    player_tag="Your Brawl Stars player tag (e.g., #Q8YYOJU)"
+    player_tag="Your Brawl Stars player tag (e.g., #Q8YY0JU)"
 )
+@quotas.limit_command("bsregister")
+@metrics.timed_command("bsregister")
+@tracing.trace_command("bsregister")
 async def bs_register(interaction: discord.Interaction, username: str, player_tag: str):
-    await interaction.response.defer()
+    try:
+        player_tag = canonicalize_tag(player_tag)
+    except InvalidTagError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
     
-    # Verify the player tag works
-    if not player_tag.startswith("#"):
-        player_tag = "#" + player_tag
+    await defer(interaction)
     
-    data = brawl_stars.fetch_brawl_stars_stats(player_tag, BRAWL_STARS_API_KEY)
+    # Verify the player tag works
+    data = await asyncio.to_thread(brawl_stars.fetch_brawl_stars_stats, player_tag, BRAWL_STARS_API_KEY)
     
     if not data:
-        await interaction.followup.send(
+        await send(
+            interaction,
             f"❌ Could not find player with tag `{player_tag}`.\n"
             f"Please make sure the tag is correct!"
         )
         return
     
     # Register the player
-    saved_tag = brawl_stars.register_player(username, player_tag)
+    saved_tag = await asyncio.to_thread(brawl_stars.register_player, username, player_tag)
+    await asyncio.to_thread(digest.add_players, "brawl_stars", interaction.guild_id, [saved_tag])
     player_name = data.get("name", username)
     
-    await interaction.followup.send(
+    await send(
+        interaction,
         f"✅ Successfully registered!\n"
         f"**Username:** {username}\n"
         f"**Player:** {player_name}\n"
@@ -108,78 +302,209 @@ async def bs_register(interaction: discord.Interaction, username: str, player_ta
     )
 
 
-@bot.tree.command(name="bsunregister", description="Remove your Brawl Stars registration")
+@app_commands.command(name="bsunregister", description="Remove your Brawl Stars registration")
 @app_commands.describe(
     username="Your registered username"
 )
+@metrics.timed_command("bsunregister")
+@tracing.trace_command("bsunregister")
 async def bs_unregister(interaction: discord.Interaction, username: str):
-    await interaction.response.defer()
+    await defer(interaction)
     
-    if brawl_stars.unregister_player(username):
-        await interaction.followup.send(f"✅ Successfully removed registration for `{username}`")
+    player_tag = await asyncio.to_thread(brawl_stars.unregister_player, username)
+    if player_tag:
+        await asyncio.to_thread(forget_digest_player, brawl_stars, "brawl_stars", player_tag)
+        await send(interaction, f"✅ Successfully removed registration for `{username}`")
     else:
-        await interaction.followup.send(f"❌ No registration found for `{username}`")
+        await send(interaction, f"❌ No registration found for `{username}`")
+
+
+@app_commands.command(name="bsclub", description="Get Brawl Stars club roster and stats")
+@app_commands.describe(
+    club="Club tag (e.g., #2YQ0PUJ) OR a registered username to show their club"
+)
+@quotas.limit_command("bsclub")
+@metrics.timed_command("bsclub")
+@tracing.trace_command("bsclub")
+async def bsclub_cmd(interaction: discord.Interaction, club: str):
+    # A registered username resolves to that player's club
+    player_tag = brawl_stars.get_player_tag(club)
+    club_tag = None
+    if not player_tag:
+        try:
+            club_tag = canonicalize_tag(club)
+        except InvalidTagError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+    
+    await defer(interaction)
+    
+    # Both fetch and cache lookup give (club tag, club); no club tag means the player isn't in one
+    def fetch():
+        tag = club_tag
+        if player_tag:
+            player = brawl_stars.fetch_brawl_stars_stats(player_tag, BRAWL_STARS_API_KEY)
+            if not player or not player.get("club"):
+                return None, None
+            tag = player["club"]["tag"]
+        return tag, brawl_stars.fetch_brawl_stars_club(tag, BRAWL_STARS_API_KEY)
+    
+    def cached():
+        tag = club_tag
+        player_age = 0
+        if player_tag:
+            cached_player = brawl_stars.cached_brawl_stars_stats(player_tag)
+            if cached_player is None or not cached_player[0].get("club"):
+                return None
+            tag = cached_player[0]["club"]["tag"]
+            player_age = cached_player[1]
+        cached_club = brawl_stars.cached_brawl_stars_club(tag)
+        if cached_club is None:
+            return None
+        return [(tag, cached_club[0])], max(player_age, cached_club[1])
+    
+    def render(results):
+        tag, data = results[0]
+        if tag is None:
+            return f"❌ `{club}` is not in a Brawl Stars club."
+        if not data:
+            return (
+                f"❌ Could not find Brawl Stars club `{tag}`.\n"
+                f"💡 Make sure the club tag is correct!"
+            )
+        view = brawl_stars.ClubRosterView(data)
+        return view.current_embed(), None, view
+    
+    await respond_by_deadline(interaction, [fetch], cached, render)
 
 
 # ============================
 # CLASH ROYALE COMMANDS
 # ============================
-@bot.tree.command(name="clashroyale", description="Get Clash Royale stats")
+@app_commands.command(name="clashroyale", description="Get Clash Royale stats")
 @app_commands.describe(
-    player="Player tag (e.g., #2ABC123) OR registered username"
+    player="Player tag (e.g., #8QU8J9LP) OR registered username"
 )
+@quotas.limit_command("clashroyale")
+@metrics.timed_command("clashroyale")
+@tracing.trace_command("clashroyale")
 async def clashroyale_cmd(interaction: discord.Interaction, player: str):
-    await interaction.response.defer()
+    # Registered username or player tag; impossible tags are rejected locally
+    try:
+        player_tag = clash_royale.resolve_player_tag(player)
+    except InvalidTagError as e:
+        await interaction.response.send_message(
+            f"❌ {e}\n💡 Use `/crregister` to save your tag!", ephemeral=True
+        )
+        return
     
-    # Check if it's a registered username first
-    player_tag = clash_royale.get_player_tag(player)
+    await defer(interaction)
     
-    # If not registered, treat as player tag
-    if not player_tag:
-        player_tag = player
-        # Ensure the tag starts with #
-        if not player_tag.startswith("#"):
-            player_tag = "#" + player_tag
+    def render(results):
+        data = results[0]
+        if not data:
+            return (
+                f"❌ Could not find Clash Royale player `{player_tag}`.\n"
+                f"💡 Make sure the tag is correct or use `/crregister` to save your tag!"
+            )
+        clash_royale.remember_lookup(interaction.guild_id, data)
+        return clash_royale.build_clash_royale_embed(data), clash_royale.build_clash_royale_card(data)
     
-    data = clash_royale.fetch_clash_royale_stats(player_tag, CLASH_ROYALE_API_KEY)
+    await respond_by_deadline(
+        interaction,
+        [lambda: clash_royale.fetch_clash_royale_stats(player_tag, CLASH_ROYALE_API_KEY)],
+        lambda: cached_together(clash_royale.cached_clash_royale_stats(player_tag)),
+        render
+    )
+
+
+@clashroyale_cmd.autocomplete("player")
+async def clashroyale_player_autocomplete(interaction: discord.Interaction, current: str):
+    return player_choices(clash_royale, interaction, current)
+
+
+@app_commands.command(name="crmeta", description="Most used Clash Royale decks and cards in this server")
+@app_commands.describe(
+    player="Also find decks similar to this player's (tag or registered username)"
+)
+@quotas.limit_command("crmeta")
+@metrics.timed_command("crmeta")
+@tracing.trace_command("crmeta")
+async def crmeta_cmd(interaction: discord.Interaction, player: Optional[str] = None):
+    player_tag = None
+    if player:
+        try:
+            player_tag = clash_royale.resolve_player_tag(player)
+        except InvalidTagError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
     
-    if not data:
-        await interaction.followup.send(
-            f"❌ Could not find Clash Royale player `{player_tag}`.\n"
-            f"💡 Make sure the tag is correct or use `/crregister` to save your tag!"
-        )
+    await defer(interaction)
+    
+    if not player_tag:
+        stats = clash_royale.guild_deck_stats(interaction.guild_id)
+        await send(interaction, embed=clash_royale.build_crmeta_embed(stats))
         return
     
-    embed = clash_royale.build_clash_royale_embed(data)
-    await interaction.followup.send(embed=embed)
+    def render(results):
+        data = results[0]
+        if not data:
+            return f"❌ Could not find Clash Royale player `{player_tag}`."
+        
+        clash_royale.remember_lookup(interaction.guild_id, data)
+        similar = clash_royale.similar_decks(data.get("tag", player_tag), interaction.guild_id)
+        stats = clash_royale.guild_deck_stats(interaction.guild_id)
+        return clash_royale.build_crmeta_embed(stats, data.get("name", player_tag), similar), None
+    
+    await respond_by_deadline(
+        interaction,
+        [lambda: clash_royale.fetch_clash_royale_stats(player_tag, CLASH_ROYALE_API_KEY)],
+        lambda: cached_together(clash_royale.cached_clash_royale_stats(player_tag)),
+        render
+    )
 
 
-@bot.tree.command(name="crregister", description="Register your Clash Royale player tag")
+@crmeta_cmd.autocomplete("player")
+async def crmeta_player_autocomplete(interaction: discord.Interaction, current: str):
+    return player_choices(clash_royale, interaction, current)
+
+
+@app_commands.command(name="crregister", description="Register your Clash Royale player tag")
 @app_commands.describe(
     username="Your username (used for quick lookups)",
-    player_tag="Your Clash Royale player tag (e.g., #2ABC123)"
+    player_tag="Your Clash Royale player tag (e.g., #8QU8J9LP)"
 )
+@quotas.limit_command("crregister")
+@metrics.timed_command("crregister")
+@tracing.trace_command("crregister")
 async def cr_register(interaction: discord.Interaction, username: str, player_tag: str):
-    await interaction.response.defer()
+    try:
+        player_tag = canonicalize_tag(player_tag)
+    except InvalidTagError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
     
-    # Verify the player tag works
-    if not player_tag.startswith("#"):
-        player_tag = "#" + player_tag
+    await defer(interaction)
     
-    data = clash_royale.fetch_clash_royale_stats(player_tag, CLASH_ROYALE_API_KEY)
+    # Verify the player tag works
+    data = await asyncio.to_thread(clash_royale.fetch_clash_royale_stats, player_tag, CLASH_ROYALE_API_KEY)
     
     if not data:
-        await interaction.followup.send(
+        await send(
+            interaction,
             f"❌ Could not find player with tag `{player_tag}`.\n"
             f"Please make sure the tag is correct!"
         )
         return
     
     # Register the player
-    saved_tag = clash_royale.register_player(username, player_tag)
+    saved_tag = await asyncio.to_thread(clash_royale.register_player, username, player_tag)
+    await asyncio.to_thread(digest.add_players, "clash_royale", interaction.guild_id, [saved_tag])
+    clash_royale.remember_lookup(interaction.guild_id, data)
     player_name = data.get("name", username)
     
-    await interaction.followup.send(
+    await send(
+        interaction,
         f"✅ Successfully registered!\n"
         f"**Username:** {username}\n"
         f"**Player:** {player_name}\n"
@@ -188,71 +513,102 @@ async def cr_register(interaction: discord.Interaction, username: str, player_ta
     )
 
 
-@bot.tree.command(name="crunregister", description="Remove your Clash Royale registration")
+@app_commands.command(name="crunregister", description="Remove your Clash Royale registration")
 @app_commands.describe(
     username="Your registered username"
 )
+@metrics.timed_command("crunregister")
+@tracing.trace_command("crunregister")
 async def cr_unregister(interaction: discord.Interaction, username: str):
-    await interaction.response.defer()
+    await defer(interaction)
     
-    if clash_royale.unregister_player(username):
-        await interaction.followup.send(f"✅ Successfully removed registration for `{username}`")
+    player_tag = await asyncio.to_thread(clash_royale.unregister_player, username)
+    if player_tag:
+        await asyncio.to_thread(forget_digest_player, clash_royale, "clash_royale", player_tag)
+        await send(interaction, f"✅ Successfully removed registration for `{username}`")
     else:
-        await interaction.followup.send(f"❌ No registration found for `{username}`")
+        await send(interaction, f"❌ No registration found for `{username}`")
 
 
 # ============================
 # FORTNITE COMMANDS
 # ============================
-@bot.tree.command(name="fortnite", description="Get Fortnite stats for a username")
+@app_commands.command(name="fortnite", description="Get Fortnite stats for a username")
 @app_commands.describe(
     username="The Fortnite username",
-    platform="Choose your login platform"
+    platform="Choose your login platform",
+    stats="Which stats to show (default: lifetime)",
+    inputs="Also break stats down by input type (keyboard & mouse / controller / touch)"
 )
 @app_commands.choices(platform=[
     app_commands.Choice(name="🎮 Epic Games (PC/Mobile/Switch)", value="epic"),
     app_commands.Choice(name="🎮 PlayStation Network (PSN)", value="psn"),
     app_commands.Choice(name="🎮 Xbox Live (XBL)", value="xbl")
 ])
+@app_commands.choices(stats=[
+    app_commands.Choice(name="♾️ Lifetime", value="lifetime"),
+    app_commands.Choice(name="🗓️ This Season", value="season"),
+    app_commands.Choice(name="📊 Season + Lifetime", value="both")
+])
+@quotas.limit_command("fortnite")
+@metrics.timed_command("fortnite")
+@tracing.trace_command("fortnite")
 async def fortnite_cmd(
     interaction: discord.Interaction,
     username: str,
-    platform: app_commands.Choice[str]
+    platform: app_commands.Choice[str],
+    stats: Optional[app_commands.Choice[str]] = None,
+    inputs: bool = False
 ):
-    await interaction.response.defer()
+    await defer(interaction)
     
     account_type = platform.value
     platform_name = platform.name
+    view = stats.value if stats else "lifetime"
+    windows = ["lifetime", "season"] if view == "both" else [view]
     
-    data = fortnite.fetch_fortnite_stats(username, account_type, FORTNITE_API_KEY)
-    if not data:
-        await interaction.followup.send(
-            f"❌ Could not connect to Fortnite API. Please try again later."
-        )
-        return
-    
-    if data.get("status") == 403:
-        await interaction.followup.send(
-            f"🔒 The stats for `{username}` on **{platform_name}** are set to private.\n"
-            f"💡 To make stats public: Fortnite Settings → Account and Privacy → Show on Career Leaderboard (ON)"
-        )
-        return
+    def render(results):
+        data = results[0]
+        season_data = results[1] if view == "both" else None
+        
+        if not data:
+            return f"❌ Could not connect to Fortnite API. Please try again later."
+        
+        if data.get("status") == 403:
+            return (
+                f"🔒 The stats for `{username}` on **{platform_name}** are set to private.\n"
+                f"💡 To make stats public: Fortnite Settings → Account and Privacy → Show on Career Leaderboard (ON)"
+            )
+        
+        if data.get("no_matches"):
+            return f"🗓️ `{username}` hasn't played any matches this season on **{platform_name}**."
+        
+        if data.get("status") != 200:
+            if windows[0] != "lifetime":
+                # By name, a season 404 can't tell an unknown player from one with no matches
+                return f"❌ Could not find Fortnite player `{username}` on **{platform_name}**, or they haven't played this season."
+            return f"❌ Could not find Fortnite player `{username}` on **{platform_name}**."
+        
+        embed = fortnite.build_fortnite_embed(data, season_data=season_data, show_inputs=inputs, time_window=windows[0])
+        embed.set_author(name=f"Platform: {platform_name}")
+        return embed, fortnite.build_fortnite_card(data, windows[0])
     
-    if data.get("status") != 200:
-        await interaction.followup.send(
-            f"❌ Could not find Fortnite player `{username}` on **{platform_name}**."
-        )
-        return
-
-    embed = fortnite.build_fortnite_embed(data)
-    embed.set_author(name=f"Platform: {platform_name}")
-    await interaction.followup.send(embed=embed)
+    # Every requested time window is fetched at once so extra windows don't add latency
+    await respond_by_deadline(
+        interaction,
+        [
+            lambda window=window: fortnite.fetch_fortnite_stats(username, account_type, FORTNITE_API_KEY, window)
+            for window in windows
+        ],
+        lambda: cached_together(*(fortnite.cached_fortnite_stats(username, account_type, window) for window in windows)),
+        render
+    )
 
 
 # ============================
 # UNIVERSAL COMPARE COMMAND
 # ============================
-@bot.tree.command(name="compare", description="Compare two players (choose game first)")
+@app_commands.command(name="compare", description="Compare two players (choose game first)")
 @app_commands.describe(
     game="Which game to compare",
     player1="First player",
@@ -263,80 +619,100 @@ async def fortnite_cmd(
     app_commands.Choice(name="⭐ Brawl Stars", value="brawlstars"),
     app_commands.Choice(name="🎮 Fortnite", value="fortnite")
 ])
+@quotas.limit_command("compare")
+@metrics.timed_command("compare")
+@tracing.trace_command("compare")
 async def compare_cmd(
     interaction: discord.Interaction,
     game: app_commands.Choice[str],
     player1: str,
     player2: str
 ):
-    await interaction.response.defer()
+    await defer(interaction)
+    
+    if game.value in GAMES_BY_CHOICE and GAMES_BY_CHOICE[game.value] not in ENABLED_GAMES:
+        await send(interaction, f"❌ {game.name} isn't enabled on this bot.")
+        return
     
     if game.value == "clashroyale":
         # Clash Royale comparison
         # Check for registered usernames
-        tag1 = clash_royale.get_player_tag(player1)
-        if not tag1:
-            tag1 = player1
-            if not tag1.startswith("#"):
-                tag1 = "#" + tag1
-        
-        tag2 = clash_royale.get_player_tag(player2)
-        if not tag2:
-            tag2 = player2
-            if not tag2.startswith("#"):
-                tag2 = "#" + tag2
-        
-        # Fetch both players
-        data1 = clash_royale.fetch_clash_royale_stats(tag1, CLASH_ROYALE_API_KEY)
-        data2 = clash_royale.fetch_clash_royale_stats(tag2, CLASH_ROYALE_API_KEY)
-        
-        if not data1:
-            await interaction.followup.send(f"❌ Could not find player: `{player1}`")
-            return
-        if not data2:
-            await interaction.followup.send(f"❌ Could not find player: `{player2}`")
+        try:
+            tag1 = clash_royale.resolve_player_tag(player1)
+            tag2 = clash_royale.resolve_player_tag(player2)
+        except InvalidTagError as e:
+            await send(interaction, f"❌ {e}")
             return
         
-        embed = clash_royale.build_clash_comparison_embed(data1, data2)
-        await interaction.followup.send(embed=embed)
+        def render(results):
+            data1, data2 = results
+            if not data1:
+                return f"❌ Could not find player: `{player1}`"
+            if not data2:
+                return f"❌ Could not find player: `{player2}`"
+            
+            clash_royale.remember_lookup(interaction.guild_id, data1)
+            clash_royale.remember_lookup(interaction.guild_id, data2)
+            embed = clash_royale.build_clash_comparison_embed(data1, data2)
+            return embed, clash_royale.build_clash_comparison_card(data1, data2)
+        
+        # Fetch both players at once
+        await respond_by_deadline(
+            interaction,
+            [lambda tag=tag: clash_royale.fetch_clash_royale_stats(tag, CLASH_ROYALE_API_KEY) for tag in (tag1, tag2)],
+            lambda: cached_together(clash_royale.cached_clash_royale_stats(tag1), clash_royale.cached_clash_royale_stats(tag2)),
+            render
+        )
     
     elif game.value == "brawlstars":
         # Brawl Stars comparison
         # Check for registered usernames
-        tag1 = brawl_stars.get_player_tag(player1)
-        if not tag1:
-            tag1 = player1
-            if not tag1.startswith("#"):
-                tag1 = "#" + tag1
-        
-        tag2 = brawl_stars.get_player_tag(player2)
-        if not tag2:
-            tag2 = player2
-            if not tag2.startswith("#"):
-                tag2 = "#" + tag2
-        
-        # Fetch both players
-        data1 = brawl_stars.fetch_brawl_stars_stats(tag1, BRAWL_STARS_API_KEY)
-        data2 = brawl_stars.fetch_brawl_stars_stats(tag2, BRAWL_STARS_API_KEY)
-        
-        if not data1:
-            await interaction.followup.send(f"❌ Could not find player: `{player1}`")
-            return
-        if not data2:
-            await interaction.followup.send(f"❌ Could not find player: `{player2}`")
+        try:
+            tag1 = brawl_stars.resolve_player_tag(player1)
+            tag2 = brawl_stars.resolve_player_tag(player2)
+        except InvalidTagError as e:
+            await send(interaction, f"❌ {e}")
             return
         
-        embed = brawl_stars.build_brawl_stars_comparison_embed(data1, data2)
-        await interaction.followup.send(embed=embed)
+        def render(results):
+            data1, data2 = results
+            if not data1:
+                return f"❌ Could not find player: `{player1}`"
+            if not data2:
+                return f"❌ Could not find player: `{player2}`"
+            
+            brawl_stars.remember_lookup(interaction.guild_id, data1)
+            brawl_stars.remember_lookup(interaction.guild_id, data2)
+            embed = brawl_stars.build_brawl_stars_comparison_embed(data1, data2)
+            return embed, brawl_stars.build_brawl_stars_comparison_card(data1, data2)
+        
+        # Fetch both players at once
+        await respond_by_deadline(
+            interaction,
+            [lambda tag=tag: brawl_stars.fetch_brawl_stars_stats(tag, BRAWL_STARS_API_KEY) for tag in (tag1, tag2)],
+            lambda: cached_together(brawl_stars.cached_brawl_stars_stats(tag1), brawl_stars.cached_brawl_stars_stats(tag2)),
+            render
+        )
     
     elif game.value == "fortnite":
         # Show platform selection message
-        await interaction.followup.send(
+        await send(
+            interaction,
             f"❌ For Fortnite comparisons, please use `/fncompare` to specify platforms for each player."
         )
 
 
-@bot.tree.command(name="fncompare", description="Compare two Fortnite players")
+@compare_cmd.autocomplete("player1")
+@compare_cmd.autocomplete("player2")
+async def compare_player_autocomplete(interaction: discord.Interaction, current: str):
+    # Suggestions depend on the game picked earlier in the same command
+    game = GAMES_BY_CHOICE.get(getattr(interaction.namespace, "game", None))
+    if game not in ENABLED_GAMES:
+        return []
+    return player_choices(GAMES[game]["module"], interaction, current)
+
+
+@app_commands.command(name="fncompare", description="Compare two Fortnite players")
 @app_commands.describe(
     player1="First player's username",
     platform1="First player's platform",
@@ -355,6 +731,9 @@ async def compare_cmd(
         app_commands.Choice(name="🎮 Xbox (XBL)", value="xbl")
     ]
 )
+@quotas.limit_command("fncompare")
+@metrics.timed_command("fncompare")
+@tracing.trace_command("fncompare")
 async def fn_compare(
     interaction: discord.Interaction,
     player1: str,
@@ -362,40 +741,558 @@ async def fn_compare(
     player2: str,
     platform2: app_commands.Choice[str]
 ):
-    await interaction.response.defer()
+    await defer(interaction)
     
-    # Fetch both players' stats
-    data1 = fortnite.fetch_fortnite_stats(player1, platform1.value, FORTNITE_API_KEY)
-    data2 = fortnite.fetch_fortnite_stats(player2, platform2.value, FORTNITE_API_KEY)
+    def render(results):
+        data1, data2 = results
+        
+        # Error handling for player 1
+        if not data1 or data1.get("status") != 200:
+            return f"❌ Could not find Fortnite player `{player1}` on {platform1.name}"
+        
+        # Error handling for player 2
+        if not data2 or data2.get("status") != 200:
+            return f"❌ Could not find Fortnite player `{player2}` on {platform2.name}"
+        
+        # Build the comparison embed
+        embed = fortnite.build_fortnite_comparison_embed(data1, data2, platform1.name, platform2.name)
+        # Card fonts have no emoji, so platforms go by their plain names
+        card = fortnite.build_fortnite_comparison_card(
+            data1, data2, platform1.name.replace("🎮 ", ""), platform2.name.replace("🎮 ", "")
+        )
+        return embed, card
     
-    # Error handling for player 1
-    if not data1 or data1.get("status") != 200:
-        await interaction.followup.send(f"❌ Could not find Fortnite player `{player1}` on {platform1.name}")
+    # Fetch both players' stats at once
+    players = ((player1, platform1.value), (player2, platform2.value))
+    await respond_by_deadline(
+        interaction,
+        [lambda p=p: fortnite.fetch_fortnite_stats(*p, FORTNITE_API_KEY) for p in players],
+        lambda: cached_together(*(fortnite.cached_fortnite_stats(*p) for p in players)),
+        render
+    )
+
+
+# ============================
+# GAME REGISTRY
+# ============================
+GAMES = {
+    "clash_royale": {
+        "key": CLASH_ROYALE_API_KEY,
+        "module": clash_royale,
+        "commands": [clashroyale_cmd, cr_register, cr_unregister, crmeta_cmd],
+    },
+    "brawl_stars": {
+        "key": BRAWL_STARS_API_KEY,
+        "module": brawl_stars,
+        "commands": [brawlstars_cmd, bs_register, bs_unregister, bsclub_cmd],
+    },
+    "fortnite": {
+        "key": FORTNITE_API_KEY,
+        "module": fortnite,
+        "commands": [fortnite_cmd, fn_compare],
+    },
+}
+GAMES_BY_CHOICE = {"clashroyale": "clash_royale", "brawlstars": "brawl_stars"}
+SUPERCELL_GAME_CHOICES = [
+    app_commands.Choice(name="👑 Clash Royale", value="clashroyale"),
+    app_commands.Choice(name="⭐ Brawl Stars", value="brawlstars"),
+]
+# Blocking player fetches for batch work (imports, digests, watches)
+FETCH_PLAYER = {
+    "clash_royale": lambda tag: clash_royale.fetch_clash_royale_stats(tag, CLASH_ROYALE_API_KEY),
+    "brawl_stars": lambda tag: brawl_stars.fetch_brawl_stars_stats(tag, BRAWL_STARS_API_KEY),
+}
+
+ENABLED_GAMES = [name for name, game in GAMES.items() if game["key"]]
+
+for name, game in GAMES.items():
+    if not game["key"]:
+        print(f"⚠️ No API key for {name}; its commands are disabled.")
+        continue
+    for command in game["commands"]:
+        bot.tree.add_command(command)
+
+if CLASH_ROYALE_API_KEY or BRAWL_STARS_API_KEY:
+    bot.tree.add_command(compare_cmd)
+
+if CLASH_ROYALE_API_KEY:
+    metrics.REGISTRATIONS.set_function(lambda: len(clash_royale.load_registrations()), game="clash_royale")
+if BRAWL_STARS_API_KEY:
+    metrics.REGISTRATIONS.set_function(lambda: len(brawl_stars.load_registrations()), game="brawl_stars")
+
+
+# ============================
+# WATCH COMMANDS
+# ============================
+watch_group = app_commands.Group(
+    name="watch",
+    description="Get pinged when players cross trophy milestones"
+)
+WATCH_GAME_NAMES = {"clash_royale": "Clash Royale", "brawl_stars": "Brawl Stars"}
+
+
+@watch_group.command(name="add", description="Watch a player's trophies (you or a rival)")
+@app_commands.describe(
+    game="Which game",
+    player="Player tag OR registered username"
+)
+@app_commands.choices(game=SUPERCELL_GAME_CHOICES)
+@quotas.limit_command("watch_add")
+@metrics.timed_command("watch_add")
+@tracing.trace_command("watch_add")
+async def watch_add(interaction: discord.Interaction, game: app_commands.Choice[str], player: str):
+    name = GAMES_BY_CHOICE[game.value]
+    if name not in ENABLED_GAMES:
+        await interaction.response.send_message(f"❌ {game.name} isn't enabled on this bot.", ephemeral=True)
+        return
+    module = GAMES[name]["module"]
+    try:
+        player_tag = module.resolve_player_tag(player)
+    except InvalidTagError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+    
+    await defer(interaction)
+    
+    data = await asyncio.to_thread(FETCH_PLAYER[name], player_tag)
+    if not data:
+        await send(interaction, f"❌ Could not find {game.name} player `{player_tag}`.")
+        return
+    
+    entry = module.watch_entry(data)
+    result = watch.add_watch(name, player_tag, entry, interaction.user.id, interaction.channel_id)
+    if result == "limit":
+        await send(interaction, f"❌ You can watch at most {watch.WATCHES_PER_USER} players. Remove one with `/watch remove`.")
+        return
+    
+    step = watch.MILESTONE_STEPS[name]
+    next_milestone = (entry["trophies"] // step + 1) * step
+    await send(
+        interaction,
+        f"👀 {'Now watching' if result == 'added' else 'Alerts moved here for'} **{entry['name']}** ({player_tag}) "
+        f"at {entry['trophies']:,} 🏆.\n"
+        f"You'll be pinged in this channel every {step:,} trophies, starting at **{next_milestone:,}**."
+    )
+
+
+@watch_group.command(name="remove", description="Stop watching a player")
+@app_commands.describe(
+    game="Which game",
+    player="Player tag OR registered username"
+)
+@app_commands.choices(game=SUPERCELL_GAME_CHOICES)
+async def watch_remove(interaction: discord.Interaction, game: app_commands.Choice[str], player: str):
+    name = GAMES_BY_CHOICE[game.value]
+    try:
+        player_tag = GAMES[name]["module"].resolve_player_tag(player)
+    except InvalidTagError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+    
+    if watch.remove_watch(name, player_tag, interaction.user.id):
+        await interaction.response.send_message(f"✅ Stopped watching `{player_tag}`.", ephemeral=True)
+    else:
+        await interaction.response.send_message(f"❌ You aren't watching `{player_tag}`.", ephemeral=True)
+
+
+@watch_group.command(name="list", description="Show the players you're watching")
+async def watch_list(interaction: discord.Interaction):
+    watches = watch.user_watches(interaction.user.id)
+    if not watches:
+        await interaction.response.send_message("📭 You aren't watching anyone. Start with `/watch add`.", ephemeral=True)
+        return
+    
+    lines = [f"• **{player_name}** `{tag}` ({WATCH_GAME_NAMES.get(game, game)})" for game, tag, player_name in watches]
+    await interaction.response.send_message("👀 **Watching:**\n" + "\n".join(lines), ephemeral=True)
+
+
+watch_add.autocomplete("player")(compare_player_autocomplete)
+watch_remove.autocomplete("player")(compare_player_autocomplete)
+
+
+# ============================
+# ADMIN COMMANDS
+# ============================
+trace_group = app_commands.Group(
+    name="trace",
+    description="Inspect recent interaction traces",
+    default_permissions=discord.Permissions(administrator=True)
+)
+
+
+@trace_group.command(name="last", description="Summarize the slowest recent interactions")
+@app_commands.describe(
+    count="How many traces to show (default 3)"
+)
+async def trace_last(interaction: discord.Interaction, count: app_commands.Range[int, 1, 10] = 3):
+    traces = tracing.slowest_traces(count)
+    if not traces:
+        await interaction.response.send_message("📭 No traces recorded yet.", ephemeral=True)
+        return
+    
+    embed = discord.Embed(
+        title="🔍 SLOWEST RECENT INTERACTIONS",
+        description=f"From the last {len(tracing.recent_traces)} kept traces (sampled + slow)",
+        color=discord.Color.dark_grey()
+    )
+    for root in traces:
+        embed.add_field(
+            name=f"{root.name} — {root.duration * 1000:.0f}ms",
+            value=f"<t:{int(root.start_time)}:R>\n```\n{tracing.format_trace(root)[:900]}\n```",
+            inline=False
+        )
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+bot.tree.add_command(trace_group)
+
+
+registrations_group = app_commands.Group(
+    name="registrations",
+    description="Import or export this server's registered players in bulk",
+    default_permissions=discord.Permissions(manage_guild=True),
+    guild_only=True
+)
+
+
+@registrations_group.command(name="import", description="Register players from a CSV (username,tag) or JSON file")
+@app_commands.describe(
+    game="Which game the tags are for",
+    file="CSV with username,tag rows or a JSON username → tag object",
+    overwrite="Replace usernames already registered to a different tag (default: keep them)"
+)
+@app_commands.choices(game=SUPERCELL_GAME_CHOICES)
+@quotas.limit_command("registrations_import")
+@metrics.timed_command("registrations_import")
+@tracing.trace_command("registrations_import")
+async def registrations_import(
+    interaction: discord.Interaction,
+    game: app_commands.Choice[str],
+    file: discord.Attachment,
+    overwrite: bool = False
+):
+    name = GAMES_BY_CHOICE[game.value]
+    if name not in ENABLED_GAMES:
+        await interaction.response.send_message(f"❌ {game.name} isn't enabled on this bot.", ephemeral=True)
+        return
+    if file.size > registrations.IMPORT_MAX_BYTES:
+        await interaction.response.send_message("❌ That file is too large (1 MB max).", ephemeral=True)
         return
     
-    # Error handling for player 2
-    if not data2 or data2.get("status") != 200:
-        await interaction.followup.send(f"❌ Could not find Fortnite player `{player2}` on {platform2.name}")
+    await interaction.response.send_message(f"📥 Reading `{file.filename}`…", ephemeral=True)
+    
+    try:
+        entries = registrations.parse_file(file.filename, await file.read())
+    except registrations.ImportFileError as e:
+        await interaction.edit_original_response(content=f"❌ {e}")
+        return
+    
+    async def show_progress(report):
+        try:
+            await interaction.edit_original_response(content=report.progress())
+        except discord.HTTPException as e:
+            print("REGISTRATION IMPORT PROGRESS ERROR:", e)
+    
+    module = GAMES[name]["module"]
+    report = await registrations.validate(entries, FETCH_PLAYER[name], module.player_not_found, show_progress)
+    
+    # Registrations are shared by every server, so overwrite only takes usernames
+    # back from this server's own players. Everything accepted is written in one save
+    own_tags = await asyncio.to_thread(digest.guild_players, name, interaction.guild_id)
+    saved, skipped = await asyncio.to_thread(module.register_players, report.accepted, overwrite, own_tags)
+    await asyncio.to_thread(digest.add_players, name, interaction.guild_id, saved.values())
+    
+    summary = (
+        f"✅ Imported **{len(saved)}** {game.name} registration{'s' if len(saved) != 1 else ''} "
+        f"from {report.total} entries in {time.monotonic() - report.started:.0f}s."
+    )
+    if skipped and overwrite:
+        summary += f"\n⏭️ {len(skipped)} username(s) registered to players from other servers were kept."
+    elif skipped:
+        summary += f"\n⏭️ {len(skipped)} username(s) already registered to another tag were kept (use `overwrite`)."
+    if report.rejected:
+        summary += f"\n❌ {len(report.rejected)} entries were rejected; see the attached file."
+        await interaction.edit_original_response(
+            content=summary,
+            attachments=[discord.File(io.BytesIO(report.rejected_csv()), filename="rejected.csv")]
+        )
+    else:
+        await interaction.edit_original_response(content=summary)
+
+
+@registrations_group.command(name="export", description="Download this server's registered players as CSV")
+@app_commands.describe(
+    game="Which game's registrations to export"
+)
+@app_commands.choices(game=SUPERCELL_GAME_CHOICES)
+async def registrations_export(interaction: discord.Interaction, game: app_commands.Choice[str]):
+    name = GAMES_BY_CHOICE[game.value]
+    if name not in ENABLED_GAMES:
+        await interaction.response.send_message(f"❌ {game.name} isn't enabled on this bot.", ephemeral=True)
+        return
+    
+    # Only players registered from this server; other servers' registrations stay private
+    own_tags = await asyncio.to_thread(digest.guild_players, name, interaction.guild_id)
+    stored = await asyncio.to_thread(GAMES[name]["module"].load_registrations)
+    stored = {username: tag for username, tag in stored.items() if tag in own_tags}
+    content = registrations.export_csv(stored)
+    await interaction.response.send_message(
+        f"📤 {len(stored)} {game.name} registration{'s' if len(stored) != 1 else ''} from this server",
+        file=discord.File(io.BytesIO(content), filename=registrations.EXPORT_FILENAME.format(game=name)),
+        ephemeral=True
+    )
+
+
+digest_group = app_commands.Group(
+    name="digest",
+    description="Daily summary of this server's registered players",
+    default_permissions=discord.Permissions(manage_guild=True),
+    guild_only=True
+)
+
+
+@digest_group.command(name="set", description="Post the daily digest in a channel")
+@app_commands.describe(
+    channel="Where to post the digest"
+)
+async def digest_set(interaction: discord.Interaction, channel: discord.TextChannel):
+    await asyncio.to_thread(digest.set_channel, interaction.guild_id, channel.id)
+    await interaction.response.send_message(
+        f"✅ The daily digest will be posted in {channel.mention} at {digest.DIGEST_HOUR_UTC:02d}:00 UTC.\n"
+        f"💡 It covers players registered from this server with `/crregister`, `/bsregister` or `/registrations import`. "
+        f"Registrations made before digests existed aren't tied to a server, so register or import those players again here to include them.",
+        ephemeral=True
+    )
+
+
+@digest_group.command(name="off", description="Stop posting the daily digest")
+async def digest_off(interaction: discord.Interaction):
+    if await asyncio.to_thread(digest.set_channel, interaction.guild_id, None):
+        await interaction.response.send_message("✅ Daily digest turned off.", ephemeral=True)
+    else:
+        await interaction.response.send_message("❌ This server has no daily digest.", ephemeral=True)
+
+
+if CLASH_ROYALE_API_KEY or BRAWL_STARS_API_KEY:
+    bot.tree.add_command(registrations_group)
+    bot.tree.add_command(digest_group)
+    bot.tree.add_command(watch_group)
+
+
+# ============================
+# STARTUP
+# ============================
+DECK_INDEX_SAVE_SECONDS = 300
+
+
+def warm_up_game(name):
+    """Import one game module and warm its connections and data; returns phase timings"""
+    module = GAMES[name]["module"]
+    start = time.perf_counter()
+    warm_up = module.warm_up  # first attribute access runs the lazily imported module
+    imported = time.perf_counter()
+    warm_up(GAMES[name]["key"])
+    return {"import": imported - start, "warm-up": time.perf_counter() - imported}
+
+
+@bot.event
+async def setup_hook():
+    # Runs once per process, before connecting to the gateway (so before any command)
+    print(f"⏱️ Startup: bot module loaded in {(time.perf_counter() - STARTUP_STARTED) * 1000:.0f}ms")
+    loop_watchdog.start()
+    cards.start()
+    
+    # Games warm up concurrently; each runs in its own thread since the work is blocking I/O
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(asyncio.to_thread(warm_up_game, name) for name in ENABLED_GAMES),
+        return_exceptions=True
+    )
+    for name, result in zip(ENABLED_GAMES, results):
+        if isinstance(result, Exception):
+            print(f"❌ WARM-UP ERROR ({name}):", result)
+            continue
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in result.items())
+        print(f"⏱️   {name}: {phases}")
+    print(f"⏱️ Startup: games warmed up in {(time.perf_counter() - start) * 1000:.0f}ms")
+    bot.loop.create_task(refresh_reference_data_daily())
+    if CLASH_ROYALE_API_KEY:
+        bot.loop.create_task(save_deck_index_periodically())
+    if CLASH_ROYALE_API_KEY or BRAWL_STARS_API_KEY:
+        bot.loop.create_task(post_digests_daily())
+        print(f"👀 Watching {await asyncio.to_thread(watch.load_watches)} players")
+        bot.loop.create_task(poll_watches())
+
+
+async def save_deck_index_periodically():
+    """Persist the Clash Royale deck index every few minutes when it changed"""
+    while True:
+        await asyncio.sleep(DECK_INDEX_SAVE_SECONDS)
+        try:
+            await asyncio.to_thread(clash_royale.save_deck_index)
+        except Exception as e:
+            print("❌ DECK INDEX SAVE ERROR:", e)
+
+
+async def post_digests():
+    """Fetch every digest guild's registered players once, then post each guild's digest"""
+    state = await asyncio.to_thread(digest.load_state)
+    if not state["channels"]:
         return
     
-    # Build and send comparison embed
-    embed = fortnite.build_fortnite_comparison_embed(data1, data2, platform1.name, platform2.name)
-    await interaction.followup.send(embed=embed)
+    players = {}
+    for name in ENABLED_GAMES:
+        module = GAMES[name]["module"]
+        if not hasattr(module, "digest_entry"):
+            continue
+        registered = set((await asyncio.to_thread(module.load_registrations)).values())
+        fetched = await scheduler.fetch_all(digest.unique_tags(state, name, registered), FETCH_PLAYER[name])
+        players[name] = {tag: module.digest_entry(data) for tag, data in fetched.items()}
+    
+    for guild_id, embed in digest.build_digest_embeds(state, players).items():
+        channel = bot.get_channel(state["channels"][guild_id])
+        if channel is None:
+            continue
+        try:
+            await channel.send(embed=embed)
+        except discord.HTTPException as e:
+            print(f"❌ DIGEST POST ERROR (guild {guild_id}):", e)
+    
+    await asyncio.to_thread(digest.record_snapshots, players)
+
+
+async def post_digests_daily():
+    """Post the guild digests every day at DIGEST_HOUR_UTC"""
+    while True:
+        await asyncio.sleep(digest.seconds_until_next_run())
+        started = time.perf_counter()
+        try:
+            await post_digests()
+        except Exception as e:
+            print("❌ DIGEST ERROR:", e)
+            continue
+        print(f"📰 Digests posted in {time.perf_counter() - started:.0f}s")
+
+
+async def send_milestone_alert(name, milestone, subscribers, game):
+    """Ping every subscriber of a watched player, one message per channel"""
+    by_channel = {}
+    for subscriber in subscribers:
+        by_channel.setdefault(subscriber["channel"], []).append(f"<@{subscriber['user']}>")
+    for channel_id, mentions in by_channel.items():
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            continue
+        try:
+            await channel.send(
+                f"🎉 {' '.join(mentions)} **{name}** just crossed **{milestone:,}** 🏆 in {WATCH_GAME_NAMES[game]}!"
+            )
+        except discord.HTTPException as e:
+            print(f"❌ WATCH ALERT ERROR (channel {channel_id}):", e)
+
+
+async def poll_watches():
+    """Poll due watched players (each tag once, however many watchers) and send milestone alerts"""
+    while True:
+        await asyncio.sleep(watch.WATCH_TICK_SECONDS)
+        try:
+            for name, tags in watch.due_tags().items():
+                if name not in ENABLED_GAMES:
+                    continue
+                module = GAMES[name]["module"]
+                fetched = await scheduler.fetch_all(tags, FETCH_PLAYER[name])
+                for tag in tags:
+                    data = fetched.get(tag)
+                    alert = watch.observe(name, tag, module.watch_entry(data) if data else None)
+                    if alert:
+                        await send_milestone_alert(*alert, name)
+            await asyncio.to_thread(watch.save_watches)
+        except Exception as e:
+            print("❌ WATCH POLL ERROR:", e)
+
+
+async def refresh_reference_data_daily():
+    """Keep the card/brawler catalogs at most a day old (warm-up loaded them at startup)"""
+    while True:
+        await asyncio.sleep(reference_data.REFRESH_SECONDS)
+        for name in ENABLED_GAMES:
+            module = GAMES[name]["module"]
+            if hasattr(module, "refresh_reference_data"):
+                try:
+                    await asyncio.to_thread(module.refresh_reference_data, GAMES[name]["key"])
+                except Exception as e:
+                    print(f"❌ REFERENCE DATA ERROR ({name}):", e)
 
 
 # ============================
-# READY EVENT
+# COMMAND SYNC
 # ============================
+COMMAND_SYNC_FILE = "command_sync_state.json"
+
+def command_tree_fingerprint(guild=None):
+    """Hash of every command definition that would be synced"""
+    payload = [cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands(guild=guild)]
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+def load_sync_state():
+    """Load the last synced fingerprints from file"""
+    if os.path.exists(COMMAND_SYNC_FILE):
+        try:
+            with open(COMMAND_SYNC_FILE, 'r') as f:
+                return json.load(f)
+        except:
+            return {}
+    return {}
+
+def save_sync_state(state):
+    """Save the last synced fingerprints to file"""
+    with open(COMMAND_SYNC_FILE, 'w') as f:
+        json.dump(state, f, indent=2)
+
+async def sync_commands():
+    """Sync the command tree only if its definitions changed since the last sync"""
+    guild = None
+    if DEV_GUILD_ID:
+        guild = discord.Object(id=int(DEV_GUILD_ID))
+        bot.tree.copy_global_to(guild=guild)
+    
+    # Fingerprints are per application and target, so switching bots or guilds re-syncs
+    target = f"{bot.application_id}:{DEV_GUILD_ID or 'global'}"
+    fingerprint = command_tree_fingerprint(guild)
+    state = load_sync_state()
+    
+    if state.get(target) == fingerprint:
+        commands_list = bot.tree.get_commands(guild=guild)
+        print(f"✅ Commands unchanged, skipped sync: {len(commands_list)}")
+    else:
+        commands_list = await bot.tree.sync(guild=guild)
+        state[target] = fingerprint
+        save_sync_state(state)
+        print(f"✅ Commands synced{' to dev guild ' + DEV_GUILD_ID if DEV_GUILD_ID else ''}: {len(commands_list)}")
+    
+    print("\n📋 Available commands:")
+    for cmd in commands_list:
+        print(f"  /{cmd.name}")
+    print()
+
+
+_commands_synced = False
+
 @bot.event
 async def on_ready():
+    # on_ready fires again on every gateway reconnect; only check the tree once per process
+    global _commands_synced
     print(f"✅ Bot online: {bot.user}")
+    if _commands_synced:
+        return
     try:
-        synced = await bot.tree.sync()
-        print(f"✅ Commands synced: {len(synced)}")
-        print("\n📋 Available commands:")
-        for cmd in synced:
-            print(f"  /{cmd.name}")
-        print()
+        start = time.perf_counter()
+        await sync_commands()
+        _commands_synced = True
+        print(f"⏱️ Startup: command sync check took {(time.perf_counter() - start) * 1000:.0f}ms")
+        print(f"⏱️ Startup: ready {(time.perf_counter() - STARTUP_STARTED) * 1000:.0f}ms after launch")
     except Exception as e:
         print("❌ SYNC ERROR:", e)
 
@@ -403,5 +1300,7 @@ async def on_ready():
 # ============================
 # RUN BOT
 # ============================
-if __name__ == "__main__":
+def main():
+    if METRICS_PORT:
+        metrics.start_metrics_server(int(METRICS_PORT), METRICS_HOST)
     bot.run(DISCORD_TOKEN)
\ No newline at end of file
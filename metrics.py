@@ -0,0 +1,289 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cache
+
+# ============================
+# METRIC TYPES
+# ============================
+# Minimal Prometheus-style metrics so the bot has no extra dependency.
+# Every metric keeps one value per label combination.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+_registry = []
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a function at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        """Read this gauge's value from function() on every scrape"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def render(self):
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                value = function()
+            except Exception as e:
+                print("METRICS GAUGE ERROR:", self.name, e)
+                continue
+            with self._lock:
+                self._values[key] = value
+        return super().render()
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(e[0]), e[1], e[2])) for key, e in self._values.items())
+        for key, (bucket_counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                labels = _format_labels(self.label_names, key, ("le", repr(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _format_labels(self.label_names, key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+# ============================
+# BOT METRICS
+# ============================
+COMMAND_SECONDS = Histogram(
+    "bot_command_seconds", "End-to-end slash command latency", ["command"]
+)
+COMMAND_PHASE_SECONDS = Histogram(
+    "bot_command_phase_seconds", "Slash command latency by phase (defer/fetch/render/followup)", ["command", "phase"]
+)
+COMMAND_ERRORS = Counter(
+    "bot_command_errors_total", "Slash commands that raised an exception", ["command"]
+)
+COMMANDS_IN_FLIGHT = Gauge(
+    "bot_commands_in_flight", "Slash commands currently being handled", ["command"]
+)
+UPSTREAM_SECONDS = Histogram(
+    "bot_upstream_request_seconds", "Game API request latency", ["game"]
+)
+UPSTREAM_RESPONSES = Counter(
+    "bot_upstream_responses_total", "Game API responses by status code ('error' for transport failures)", ["game", "status"]
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "bot_upstream_requests_in_flight", "Game API requests currently in flight", ["game"]
+)
+REGISTRATIONS = Gauge(
+    "bot_registrations", "Registered usernames per game", ["game"]
+)
+
+# The slash command being handled; copied into worker threads by asyncio.to_thread
+current_command = contextvars.ContextVar("current_command", default="none")
+
+
+def timed_command(command):
+    """Decorator for slash command callbacks: end-to-end latency, errors and in-flight count.
+    Put it directly above the `async def`, below the app_commands decorators."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = current_command.set(command)
+            COMMANDS_IN_FLIGHT.inc(command=command)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                COMMAND_ERRORS.inc(command=command)
+                raise
+            finally:
+                COMMAND_SECONDS.observe(time.perf_counter() - start, command=command)
+                COMMANDS_IN_FLIGHT.dec(command=command)
+                current_command.reset(token)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def phase(name):
+    """Time a block as one phase of the current slash command"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        COMMAND_PHASE_SECONDS.observe(time.perf_counter() - start, command=current_command.get(), phase=name)
+
+
+def timed_phase(name):
+    """Decorator version of phase() for sync helpers such as fetch_* and build_*_embed"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _UpstreamCall:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = "error"
+
+
+@contextmanager
+def track_upstream(game):
+    """Time one game API request; set .status on the yielded object to the HTTP status"""
+    call = _UpstreamCall()
+    UPSTREAM_IN_FLIGHT.inc(game=game)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, game=game)
+        UPSTREAM_RESPONSES.inc(game=game, status=call.status)
+        UPSTREAM_IN_FLIGHT.dec(game=game)
+
+
+# ============================
+# EXPOSITION
+# ============================
+def _render_caches():
+    """Cache stats are read straight from the named TTLCaches at scrape time"""
+    caches = sorted(cache.CACHES.items())
+    sections = [
+        ("bot_cache_hits_total", "counter", "Cache lookups that found a fresh entry", lambda c: c.hits),
+        ("bot_cache_misses_total", "counter", "Cache lookups that found nothing fresh", lambda c: c.misses),
+        ("bot_cache_hit_ratio", "gauge", "Cache hits / lookups since start", lambda c: c.hits / (c.hits + c.misses) if c.hits + c.misses else 0),
+        ("bot_cache_entries", "gauge", "Entries currently held by the cache", len),
+    ]
+    lines = []
+    for metric_name, kind, documentation, read in sections:
+        lines.append(f"# HELP {metric_name} {documentation}")
+        lines.append(f"# TYPE {metric_name} {kind}")
+        for cache_name, c in caches:
+            lines.append(f'{metric_name}{{cache="{cache_name}"}} {read(c)}')
+    return lines
+
+
+def render():
+    """Render every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    lines.extend(_render_caches())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown out the bot's own output
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on host:port from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Metrics available at http://{host}:{port}/metrics")
+    return server
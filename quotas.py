@@ -0,0 +1,161 @@
+import contextvars
+import functools
+import math
+import os
+import time
+from contextlib import contextmanager
+
+import metrics
+from cache import TTLCache
+
+# ============================
+# SETTINGS
+# ============================
+# Budgets are in "upstream calls" per QUOTA_WINDOW_SECONDS. A command costs
+# COMMAND_COST plus one per game API request it actually made, so answers
+# served from cache are much cheaper than ones that hit the shared API keys.
+QUOTA_WINDOW_SECONDS = 60
+USER_QUOTA = float(os.getenv("QUOTA_USER_PER_MINUTE", "20"))
+GUILD_QUOTA = float(os.getenv("QUOTA_GUILD_PER_MINUTE", "120"))
+GLOBAL_QUOTA = float(os.getenv("QUOTA_GLOBAL_PER_MINUTE", "600"))
+COMMAND_COST = 0.25
+UPSTREAM_CALL_COST = 1.0
+MAX_TRACKED_KEYS = 100_000
+
+COOLDOWN_MESSAGES = {
+    "user": "⏳ Slow down! You've used up your lookups for now. Try again in {seconds}s.",
+    "guild": "⏳ This server is making a lot of lookups right now. Try again in {seconds}s.",
+    "global": "⏳ The bot is very busy right now. Try again in {seconds}s.",
+}
+
+QUOTA_REJECTIONS = metrics.Counter(
+    "bot_quota_rejections_total", "Slash commands refused by a quota", ["command", "scope"]
+)
+
+
+# ============================
+# SLIDING WINDOWS
+# ============================
+class SlidingWindowQuota:
+    """Sliding-window budget per key, approximated from the current and previous fixed windows.
+    Each key costs one small list and expires two windows after its last use."""
+
+    def __init__(self, limit, window=QUOTA_WINDOW_SECONDS, max_keys=MAX_TRACKED_KEYS):
+        self.limit = limit
+        self.window = window
+        self._counters = TTLCache(ttl=2 * window, max_entries=max_keys)
+
+    def _counter(self, key, now):
+        index = int(now // self.window)
+        counter = self._counters.get(key)  # [window index, current usage, previous usage]
+        if counter is None or counter[0] < index - 1:
+            counter = [index, 0.0, 0.0]
+        elif counter[0] == index - 1:
+            counter = [index, 0.0, counter[1]]
+        return counter
+
+    def retry_after(self, key, cost, now=None):
+        """Seconds until cost fits in the budget; 0 if it fits now"""
+        now = time.time() if now is None else now
+        index, current, previous = self._counter(key, now)
+        remaining = self.window - now % self.window
+        excess = current + previous * remaining / self.window + cost - self.limit
+        if excess <= 0:
+            return 0.0
+        # The previous window's share decays linearly until the window rolls over
+        if previous and excess <= previous * remaining / self.window:
+            return excess / previous * self.window
+        # After that, this window's usage becomes the decaying share
+        excess = current + cost - self.limit
+        if excess <= 0 or not current:
+            return remaining
+        return remaining + min(excess / current, 1.0) * self.window
+
+    def add(self, key, cost, now=None):
+        """Charge cost to key (negative refunds)"""
+        now = time.time() if now is None else now
+        counter = self._counter(key, now)
+        counter[1] = max(0.0, counter[1] + cost)
+        self._counters.set(key, counter)
+
+
+USER_QUOTAS = SlidingWindowQuota(USER_QUOTA)
+GUILD_QUOTAS = SlidingWindowQuota(GUILD_QUOTA)
+GLOBAL_QUOTAS = SlidingWindowQuota(GLOBAL_QUOTA)
+
+
+def _scopes(interaction):
+    """(scope, quota, key) for every budget an interaction draws on"""
+    scopes = [("user", USER_QUOTAS, interaction.user.id)]
+    if interaction.guild_id is not None:
+        scopes.append(("guild", GUILD_QUOTAS, interaction.guild_id))
+    scopes.append(("global", GLOBAL_QUOTAS, None))
+    return scopes
+
+
+# ============================
+# COMMAND ACCOUNTING
+# ============================
+class _Usage:
+    __slots__ = ("upstream_calls",)
+
+    def __init__(self):
+        self.upstream_calls = 0
+
+
+# The running command's usage; shared with worker threads started by asyncio.to_thread
+_usage = contextvars.ContextVar("quota_usage", default=None)
+
+
+def note_upstream_call():
+    """Charge one game API request to the slash command being handled (no-op outside one)"""
+    usage = _usage.get()
+    if usage is not None:
+        usage.upstream_calls += 1
+
+
+@contextmanager
+def uncharged():
+    """Don't charge the block's game API requests to the running command (bulk work
+    metered by the scheduler's class caps instead)"""
+    token = _usage.set(None)
+    try:
+        yield
+    finally:
+        _usage.reset(token)
+
+
+def limit_command(command):
+    """Decorator for slash command callbacks: refuse with a cooldown message when the
+    user, guild or global budget is spent. Put it above the metrics/tracing decorators."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(interaction, *args, **kwargs):
+            now = time.time()
+            scopes = _scopes(interaction)
+            # Enough room for one real API call is required up front and reserved,
+            # so a burst of simultaneous commands can't all slip through
+            reserved = COMMAND_COST + UPSTREAM_CALL_COST
+            for scope, quota, key in scopes:
+                wait = quota.retry_after(key, reserved, now)
+                if wait:
+                    QUOTA_REJECTIONS.inc(command=command, scope=scope)
+                    await interaction.response.send_message(
+                        COOLDOWN_MESSAGES[scope].format(seconds=math.ceil(wait)), ephemeral=True
+                    )
+                    return
+            for scope, quota, key in scopes:
+                quota.add(key, reserved, now)
+
+            usage = _Usage()
+            token = _usage.set(usage)
+            try:
+                return await func(interaction, *args, **kwargs)
+            finally:
+                _usage.reset(token)
+                # Settle the reservation against what the command really used
+                actual = COMMAND_COST + usage.upstream_calls * UPSTREAM_CALL_COST
+                for scope, quota, key in scopes:
+                    quota.add(key, actual - reserved)
+        return wrapper
+    return decorator
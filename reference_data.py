@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+import scheduler
+
+# ============================
+# SETTINGS
+# ============================
+# Game catalogs (Clash Royale cards, Brawl Stars brawlers) barely change, so they
+# are fetched at most once a day, kept on disk, and served from read-only tables.
+REFERENCE_DIR = "reference_data"
+REFRESH_SECONDS = 24 * 3600
+
+_EMPTY = MappingProxyType({})
+
+
+def _freeze(items):
+    """id → read-only item mapping"""
+    return MappingProxyType({item["id"]: MappingProxyType(item) for item in items if "id" in item})
+
+
+class Catalog:
+    """One game catalog: a frozen id → item table backed by a JSON file"""
+
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.join(REFERENCE_DIR, f"{name}.json")
+        self.table = _EMPTY
+        self.fetched_at = 0
+        self._lock = threading.Lock()
+
+    def get(self, item_id):
+        return self.table.get(item_id)
+
+    def values(self):
+        return self.table.values()
+
+    def __len__(self):
+        return len(self.table)
+
+    def load(self):
+        """Load the stored catalog from disk; returns False if there is none"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.table = _freeze(stored.get("items", []))
+        self.fetched_at = stored.get("fetched_at", 0)
+        return True
+
+    def refresh(self, fetch, max_age=REFRESH_SECONDS):
+        """Load from disk and, if the stored copy is older than max_age, replace it with fetch()'s items.
+        A failed fetch keeps serving the old table."""
+        with self._lock:
+            if not self.table:
+                self.load()
+            if time.time() - self.fetched_at < max_age:
+                return
+            # Never competes with slash commands for the API
+            with scheduler.priority(scheduler.BACKGROUND):
+                items = fetch()
+            if not items:
+                print(f"⚠️ Could not refresh {self.name}; using {'stored' if self.table else 'no'} reference data")
+                return
+            fetched_at = time.time()
+            os.makedirs(REFERENCE_DIR, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": fetched_at, "items": items}, f)
+            os.replace(tmp_path, self.path)
+            # Swapped in one assignment, so readers see the old or the new table, never a mix
+            self.table = _freeze(items)
+            self.fetched_at = fetched_at
@@ -0,0 +1,168 @@
+import asyncio
+import csv
+import io
+import json
+import time
+
+import quotas
+import scheduler
+from supercell import InvalidTagError, canonicalize_tag
+
+# ============================
+# SETTINGS
+# ============================
+# Bulk imports validate every tag against the game API at BULK priority,
+# so slash commands keep their share of the API while an import runs.
+IMPORT_MAX_ENTRIES = 5000
+IMPORT_MAX_BYTES = 1024 * 1024
+# One more than the BULK class may run, so a slot never sits idle without
+# parking extra worker threads in the queue
+IMPORT_CONCURRENCY = scheduler.CLASS_CAPS[scheduler.BULK] + 1
+# Failed requests (rate limits, outages) are retried after 2s, 4s, ... before
+# the entry is reported as unverified; only a real "not found" rejects a tag
+IMPORT_RETRIES = 3
+IMPORT_RETRY_DELAY = 2.0
+PROGRESS_INTERVAL = 2.0  # seconds between progress reports
+EXPORT_FILENAME = "{game}_registrations.csv"
+
+
+class ImportFileError(ValueError):
+    """Raised when an uploaded registration file can't be read"""
+
+
+# ============================
+# FILE FORMATS
+# ============================
+def parse_file(filename, content):
+    """(username, raw tag) pairs from a CSV or JSON upload.
+
+    CSV: one "username,tag" per line, with an optional header row.
+    JSON: {"username": "#TAG", ...} or [{"username": ..., "tag": ...}, ...],
+    which is also what an export contains.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ImportFileError("The file isn't UTF-8 text.") from None
+
+    if filename.lower().endswith(".json"):
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ImportFileError(f"The file isn't valid JSON: {e}") from None
+        if isinstance(data, dict):
+            rows = list(data.items())
+        elif isinstance(data, list):
+            rows = [(row.get("username"), row.get("tag")) for row in data if isinstance(row, dict)]
+        else:
+            raise ImportFileError("JSON files must hold a username → tag object or a list of entries.")
+    else:
+        rows = [row[:2] for row in csv.reader(io.StringIO(text)) if len(row) >= 2]
+        if rows and rows[0][0].strip().lower() == "username":
+            rows = rows[1:]
+
+    entries = [
+        (str(username).strip(), str(tag).strip())
+        for username, tag in rows
+        if username and tag and str(username).strip()
+    ]
+    if not entries:
+        raise ImportFileError("No `username,tag` entries found in the file.")
+    if len(entries) > IMPORT_MAX_ENTRIES:
+        raise ImportFileError(f"Too many entries ({len(entries)}); import at most {IMPORT_MAX_ENTRIES} at a time.")
+    return entries
+
+
+def export_csv(registrations):
+    """CSV bytes for a username → tag mapping, importable as-is"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["username", "tag"])
+    for username, tag in sorted(registrations.items()):
+        writer.writerow([username, tag])
+    return out.getvalue().encode("utf-8")
+
+
+# ============================
+# VALIDATION PIPELINE
+# ============================
+class ImportReport:
+    """Running totals for one import, read by the progress reporter"""
+
+    def __init__(self, total):
+        self.total = total
+        self.checked = 0
+        self.accepted = {}  # username → canonical tag
+        self.rejected = []  # (username, raw tag, reason)
+        self.started = time.monotonic()
+
+    def progress(self):
+        return (
+            f"⏳ Checked **{self.checked}/{self.total}** entries "
+            f"(✅ {len(self.accepted)} · ❌ {len(self.rejected)}) "
+            f"in {time.monotonic() - self.started:.0f}s"
+        )
+
+    def rejected_csv(self):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["username", "tag", "reason"])
+        writer.writerows(self.rejected)
+        return out.getvalue().encode("utf-8")
+
+
+async def validate(entries, fetch, not_found, on_progress=None, concurrency=IMPORT_CONCURRENCY):
+    """Check entries against the game API; fetch(tag) returns player data or None,
+    and not_found(tag) tells a missing player apart from a failed request.
+
+    Each distinct tag is fetched once, with at most `concurrency` requests in flight;
+    failed requests are retried with backoff. on_progress(report) is awaited every
+    PROGRESS_INTERVAL seconds while work remains.
+    """
+    report = ImportReport(len(entries))
+    by_tag = {}
+    for username, raw_tag in entries:
+        try:
+            tag = canonicalize_tag(raw_tag)
+        except InvalidTagError:
+            report.rejected.append((username, raw_tag, "invalid tag"))
+            report.checked += 1
+            continue
+        by_tag.setdefault(tag, []).append((username, raw_tag))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def fetch_quietly(tag):
+        # Metered by the BULK class cap instead of the importing admin's quota
+        with scheduler.priority(scheduler.BULK), quotas.uncharged():
+            return fetch(tag)
+
+    async def check(tag, rows):
+        reason = "couldn't verify (game API unavailable), try again later"
+        for attempt in range(IMPORT_RETRIES + 1):
+            if attempt:
+                # Backs off outside the semaphore, so other tags keep going meanwhile
+                await asyncio.sleep(IMPORT_RETRY_DELAY * 2 ** (attempt - 1))
+            async with semaphore:
+                try:
+                    data = await asyncio.to_thread(fetch_quietly, tag)
+                except Exception as e:
+                    print("REGISTRATION IMPORT ERROR:", tag, e)
+                    data = None
+            if data or not_found(tag):
+                reason = "player not found"
+                break
+        for username, raw_tag in rows:
+            if data:
+                report.accepted[username.lower()] = tag
+            else:
+                report.rejected.append((username, raw_tag, reason))
+        report.checked += len(rows)
+
+    tasks = [asyncio.create_task(check(tag, rows)) for tag, rows in by_tag.items()]
+    pending = set(tasks)
+    while pending:
+        _, pending = await asyncio.wait(pending, timeout=PROGRESS_INTERVAL)
+        if pending and on_progress is not None:
+            await on_progress(report)
+    return report
@@ -0,0 +1,10 @@
+# ============================
+# ENTRY POINT
+# ============================
+# `python main_bot.py` starts the bot through this file. Image cards render in
+# spawned worker processes, and spawn re-runs the __main__ script in each one,
+# so that script is kept this small instead of being the whole bot.
+if __name__ == "__main__":
+    import main_bot
+
+    main_bot.main()
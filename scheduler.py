@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+import tracing
+
+# ============================
+# SETTINGS
+# ============================
+# Priority classes, most urgent first. Slash commands are INTERACTIVE unless
+# they say otherwise; refreshes, polling and imports run under priority().
+INTERACTIVE = 0
+BACKGROUND = 1
+BULK = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BULK: "bulk"}
+
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "8"))  # per game API
+# Caps bound how much of the API a class can hold at once; whenever a slot frees
+# up, waiting interactive requests still win it. Bulk imports get half, so a
+# few thousand tags validate in minutes while commands keep the other half.
+CLASS_CAPS = {
+    INTERACTIVE: UPSTREAM_MAX_CONCURRENCY,
+    BACKGROUND: max(1, UPSTREAM_MAX_CONCURRENCY // 3),
+    BULK: max(1, UPSTREAM_MAX_CONCURRENCY // 2),
+}
+AGING_SECONDS = 5.0  # a waiting request moves up one class per this much waiting
+CANCEL_POLL_SECONDS = 0.1  # how quickly a queued request notices its caller gave up
+
+UPSTREAM_QUEUE_SECONDS = metrics.Histogram(
+    "bot_upstream_queue_seconds", "Time game API requests waited for a scheduler slot", ["game", "priority"]
+)
+
+# Priority of the work being done; copied into worker threads by asyncio.to_thread
+current_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+# Set (a threading.Event) by callers that may give up on their requests; see cancellable()
+current_cancel = contextvars.ContextVar("upstream_cancel", default=None)
+
+
+class Cancelled(Exception):
+    """Raised for a request whose caller gave up before it got an upstream slot"""
+
+
+@contextmanager
+def priority(level):
+    """Run a block (and the threads it starts) with a lower upstream priority"""
+    token = current_priority.set(level)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+@contextmanager
+def cancellable(event):
+    """Run a block whose queued requests are dropped once event is set"""
+    token = current_cancel.set(event)
+    try:
+        yield
+    finally:
+        current_cancel.reset(token)
+
+
+# ============================
+# SCHEDULER
+# ============================
+class _Waiter:
+    __slots__ = ("priority", "enqueued", "seq", "event")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.seq = seq
+        self.event = threading.Event()
+
+    def rank(self, now):
+        # Aging: waiting long enough lets background work overtake fresh interactive requests
+        return (self.priority - (now - self.enqueued) / AGING_SECONDS, self.seq)
+
+
+class UpstreamScheduler:
+    """Grants slots for one game API's requests: most urgent class first,
+    per-class concurrency caps, and aging so lower classes never starve"""
+
+    def __init__(self, game, max_concurrency=UPSTREAM_MAX_CONCURRENCY, class_caps=CLASS_CAPS):
+        self.game = game
+        self.max_concurrency = max_concurrency
+        self.class_caps = class_caps
+        self._lock = threading.Lock()
+        self._active = {level: 0 for level in class_caps}
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def _can_run(self, level):
+        return sum(self._active.values()) < self.max_concurrency and self._active[level] < self.class_caps[level]
+
+    def _dispatch(self):
+        # Called with the lock held whenever capacity frees up
+        now = time.monotonic()
+        while self._waiting:
+            runnable = [w for w in self._waiting if self._can_run(w.priority)]
+            if not runnable:
+                return
+            waiter = min(runnable, key=lambda w: w.rank(now))
+            self._waiting.remove(waiter)
+            self._active[waiter.priority] += 1
+            waiter.event.set()
+
+    def _withdraw(self, waiter):
+        """Take a waiter out of the queue; False if it was granted a slot meanwhile"""
+        with self._lock:
+            if waiter in self._waiting:
+                self._waiting.remove(waiter)
+                return True
+            return False
+
+    @contextmanager
+    def slot(self, level=None):
+        """Hold one request slot for the duration of the block.
+        Raises Cancelled if the caller's cancel event is set before a slot is granted."""
+        level = current_priority.get() if level is None else level
+        cancel = current_cancel.get()
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+        with self._lock:
+            if self._can_run(level) and not any(self._can_run(w.priority) for w in self._waiting):
+                self._active[level] += 1
+                waiter = None
+            else:
+                waiter = _Waiter(level, next(self._seq))
+                self._waiting.append(waiter)
+        if waiter is not None:
+            with tracing.span("upstream.queue", priority=PRIORITY_NAMES[level]):
+                while not waiter.event.wait(None if cancel is None else CANCEL_POLL_SECONDS):
+                    if cancel.is_set() and self._withdraw(waiter):
+                        raise Cancelled()
+            waited = time.monotonic() - waiter.enqueued
+        else:
+            waited = 0.0
+        UPSTREAM_QUEUE_SECONDS.observe(waited, game=self.game, priority=PRIORITY_NAMES[level])
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[level] -= 1
+                self._dispatch()
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def upstream_slot(game):
+    """Context manager holding a request slot on game's API, at the current priority"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(game)
+        if scheduler is None:
+            scheduler = _schedulers[game] = UpstreamScheduler(game)
+    return scheduler.slot()
+
+
+async def fetch_all(keys, fetch, level=BACKGROUND, concurrency=None):
+    """{key: result} for every key whose blocking fetch(key) returned something truthy.
+
+    Fetches run in worker threads at `level`, at most `concurrency` at a time
+    (by default one more than the class may run, so its slots never sit idle).
+    """
+    semaphore = asyncio.Semaphore(concurrency or CLASS_CAPS[level] + 1)
+    results = {}
+
+    def fetch_at_level(key):
+        with priority(level):
+            return fetch(key)
+
+    async def fetch_one(key):
+        async with semaphore:
+            try:
+                result = await asyncio.to_thread(fetch_at_level, key)
+            except Exception as e:
+                print("BACKGROUND FETCH ERROR:", key, e)
+                return
+        if result:
+            results[key] = result
+
+    await asyncio.gather(*(fetch_one(key) for key in keys))
+    return results
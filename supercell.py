@@ -0,0 +1,44 @@
+# ============================
+# SUPERCELL PLAYER TAGS
+# ============================
+# Shared by clash_royale.py and brawl_stars.py. Tags are base-14 numbers
+# written with this alphabet, so anything else can be rejected locally.
+TAG_ALPHABET = "0289PYLQGRJCUV"
+TAG_MIN_LENGTH = 3
+TAG_MAX_LENGTH = 14
+
+# Characters people commonly type instead of a real tag character
+TAG_CONFUSIONS = {
+    "O": "0",
+}
+
+
+class InvalidTagError(ValueError):
+    """Raised when input can't possibly be a Supercell player/club tag"""
+
+
+def canonicalize_tag(raw_tag):
+    """Return the canonical "#TAG" form of raw_tag, or raise InvalidTagError
+
+    Strips whitespace and any leading #, uppercases, and maps common
+    confusions (O -> 0) so every cache and registration uses the same key.
+    """
+    tag = "".join(raw_tag.split()).upper().lstrip("#")
+    tag = "".join(TAG_CONFUSIONS.get(c, c) for c in tag)
+
+    if not tag:
+        raise InvalidTagError("Please enter a player tag (e.g., #8QU8J9LP).")
+
+    invalid_chars = sorted(set(c for c in tag if c not in TAG_ALPHABET))
+    if invalid_chars:
+        raise InvalidTagError(
+            f"`#{tag}` isn't a valid tag: `{''.join(invalid_chars)}` never appear in tags. "
+            f"Tags only use the characters `{TAG_ALPHABET}`."
+        )
+
+    if not TAG_MIN_LENGTH <= len(tag) <= TAG_MAX_LENGTH:
+        raise InvalidTagError(
+            f"`#{tag}` isn't a valid tag: tags are {TAG_MIN_LENGTH}-{TAG_MAX_LENGTH} characters long."
+        )
+
+    return "#" + tag
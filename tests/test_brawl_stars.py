@@ -0,0 +1,17 @@
+import brawl_stars
+
+
+def test_power_cap_follows_observed_brawlers(monkeypatch):
+    monkeypatch.setattr(brawl_stars, "_max_power_seen", brawl_stars.BRAWLER_MAX_POWER)
+    assert brawl_stars.brawler_max_power([{"power": 9}, {}]) == brawl_stars.BRAWLER_MAX_POWER
+    assert brawl_stars.brawler_max_power([{"power": 12}]) == 12
+    # Never lowered by a profile without maxed brawlers
+    assert brawl_stars.brawler_max_power([{"power": 3}]) == 12
+
+
+def test_embed_counts_brawlers_at_the_observed_cap(monkeypatch):
+    monkeypatch.setattr(brawl_stars, "_max_power_seen", brawl_stars.BRAWLER_MAX_POWER)
+    data = {"name": "Player", "tag": "#2PY", "brawlers": [{"name": "SHELLY", "power": 12}, {"name": "COLT", "power": 11}]}
+    embed = brawl_stars.build_brawl_stars_embed(data)
+    brawlers_field = next(field for field in embed.fields if field.name == "🎮 BRAWLERS")
+    assert "**Power 12:** 1" in brawlers_field.value
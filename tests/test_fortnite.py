@@ -0,0 +1,51 @@
+import pytest
+
+import fortnite
+
+ACCOUNT_ID = "4735ce9132924caf8a5b17789b40f79c"
+
+
+def stats(time_window):
+    return {"status": 200, "data": {"account": {"id": ACCOUNT_ID, "name": "Ninja"}, "window": time_window}}
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """Stub API: the account exists but has no season matches; records every call"""
+    monkeypatch.setattr(fortnite, "ACCOUNT_CACHE_FILE", str(tmp_path / "fortnite_accounts.json"))
+    monkeypatch.setattr(fortnite, "_accounts", None)
+    fortnite._unknown_accounts.clear()
+    fortnite._stats_cache.clear()
+    calls = []
+
+    def fortnite_api_get(path, params, api_key):
+        calls.append((path, params["timeWindow"]))
+        if params["timeWindow"] == "season":
+            return {"status": 404, "error": "the requested profile didnt play any match yet"}
+        return stats(params["timeWindow"])
+
+    monkeypatch.setattr(fortnite, "fortnite_api_get", fortnite_api_get)
+    return calls
+
+
+def test_season_404_keeps_known_account(api):
+    assert fortnite.fetch_fortnite_stats("Ninja", "epic", "key")["status"] == 200
+    season = fortnite.fetch_fortnite_stats("Ninja", "epic", "key", "season")
+    assert season["status"] == 404 and season["no_matches"]
+    assert fortnite.get_account_id("ninja", "epic") == ACCOUNT_ID
+    # Lifetime still answers, from cache
+    assert fortnite.fetch_fortnite_stats("Ninja", "epic", "key")["status"] == 200
+    assert api == [("/stats/br/v2", "lifetime"), (f"/stats/br/v2/{ACCOUNT_ID}", "season")]
+
+
+def test_season_404_by_name_does_not_mark_unknown(api):
+    season = fortnite.fetch_fortnite_stats("Ninja", "epic", "key", "season")
+    assert season["status"] == 404 and not season.get("no_matches")
+    assert fortnite.get_account_id("ninja", "epic") is None
+    assert fortnite.fetch_fortnite_stats("Ninja", "epic", "key")["status"] == 200
+
+
+def test_lifetime_404_marks_unknown(api, monkeypatch):
+    monkeypatch.setattr(fortnite, "fortnite_api_get", lambda path, params, api_key: {"status": 404})
+    fortnite.fetch_fortnite_stats("Nobody", "epic", "key")
+    assert fortnite.get_account_id("nobody", "epic") is fortnite.UNKNOWN_ACCOUNT
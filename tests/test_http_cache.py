@@ -0,0 +1,34 @@
+import http_cache
+from cassette import CassetteResponse
+
+URL = "https://api.example.com/v1/players/%23ABC"
+
+
+def test_last_good_keeps_responses_without_validators():
+    response = CassetteResponse(200, {}, '{"name": "Player"}')
+    assert http_cache.update(URL, None, response) is response
+    assert http_cache.fresh(URL) is None
+
+    last_good = http_cache.LastGood(name=None)
+    assert last_good.get(URL) is None
+    last_good.remember(URL, None, response)
+    data, age = last_good.get(URL)
+    assert data == {"name": "Player"} and 0 <= age < 5
+    assert last_good.get(URL, {"timeWindow": "season"}) is None
+
+
+def test_304_after_eviction_answers_with_the_revalidated_entry():
+    url = URL + "Q"
+    http_cache.update(url, None, CassetteResponse(200, {"ETag": '"v1"'}, '{"name": "Player"}'))
+    headers, revalidated = http_cache.conditional_headers(url, headers={"Authorization": "Bearer key"})
+    assert headers["If-None-Match"] == '"v1"'
+
+    http_cache._responses.clear()  # evicted while the request was in flight
+    response = http_cache.update(url, None, CassetteResponse(304, {}, ""), revalidated)
+    assert response.status_code == 200 and response.json() == {"name": "Player"}
+    assert http_cache.conditional_headers(url)[1] is revalidated
+
+
+def test_no_validators_without_a_cached_entry():
+    headers, revalidated = http_cache.conditional_headers(URL + "NEW", headers={"Authorization": "Bearer key"})
+    assert headers == {"Authorization": "Bearer key"} and revalidated is None
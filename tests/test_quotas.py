@@ -0,0 +1,49 @@
+import pytest
+
+from quotas import SlidingWindowQuota
+
+
+@pytest.fixture
+def quota():
+    quota = SlidingWindowQuota(limit=10, window=60)
+    quota.add("user", 10, now=30)  # budget used up halfway through window 0
+    return quota
+
+
+def test_fits_until_limit():
+    quota = SlidingWindowQuota(limit=10, window=60)
+    quota.add("user", 9, now=10)
+    assert quota.retry_after("user", 1, now=10) == 0.0
+    assert quota.retry_after("user", 2, now=10) > 0
+
+
+def test_retry_after_before_rollover(quota):
+    # 30s until window 1, then window 0's usage has to decay by one request (6s)
+    assert quota.retry_after("user", 1, now=30) == pytest.approx(36)
+    assert quota.retry_after("user", 1, now=59) == pytest.approx(7)
+
+
+def test_retry_after_past_rollover(quota):
+    # Window 0's usage decays linearly; one request fits again at t=66
+    assert quota.retry_after("user", 1, now=61) == pytest.approx(5)
+    assert quota.retry_after("user", 1, now=65.5) == pytest.approx(0.5)
+    assert quota.retry_after("user", 1, now=66) == 0.0
+
+
+def test_retry_after_agrees_across_rollover(quota):
+    for now in (30, 45, 59.9, 60, 60.1, 63):
+        assert now + quota.retry_after("user", 1, now=now) == pytest.approx(66)
+
+
+def test_budget_resets_two_windows_later(quota):
+    assert quota.retry_after("user", 10, now=120) == 0.0
+
+
+def test_refund(quota):
+    quota.add("user", -3, now=31)
+    assert quota.retry_after("user", 3, now=31) == 0.0
+    assert quota.retry_after("user", 4, now=31) > 0
+
+
+def test_keys_are_independent(quota):
+    assert quota.retry_after("other", 10, now=30) == 0.0
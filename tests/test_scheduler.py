@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+from scheduler import BACKGROUND, BULK, INTERACTIVE, UpstreamScheduler
+
+TIMEOUT = 5.0
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def request(upstream, level, name, granted, release=None):
+    """Start a thread that takes a slot, records name, and holds it until release is set"""
+    def run():
+        with upstream.slot(level):
+            granted.append(name)
+            if release is not None:
+                release.wait(TIMEOUT)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_interactive_beats_fresh_bulk():
+    upstream = UpstreamScheduler("test", max_concurrency=1, class_caps={INTERACTIVE: 1, BACKGROUND: 1, BULK: 1})
+    granted = []
+    with upstream.slot(INTERACTIVE):
+        threads = [request(upstream, BULK, "bulk", granted)]
+        wait_until(lambda: len(upstream._waiting) == 1)
+        threads.append(request(upstream, INTERACTIVE, "interactive", granted))
+        wait_until(lambda: len(upstream._waiting) == 2)
+    for thread in threads:
+        thread.join(TIMEOUT)
+    assert granted == ["interactive", "bulk"]
+
+
+def test_aged_bulk_overtakes_fresh_interactive(monkeypatch):
+    monkeypatch.setattr(scheduler, "AGING_SECONDS", 0.05)
+    upstream = UpstreamScheduler("test", max_concurrency=1, class_caps={INTERACTIVE: 1, BACKGROUND: 1, BULK: 1})
+    granted = []
+    with upstream.slot(INTERACTIVE):
+        threads = [request(upstream, BULK, "bulk", granted)]
+        wait_until(lambda: len(upstream._waiting) == 1)
+        time.sleep(4 * scheduler.AGING_SECONDS)  # aged past the interactive class
+        threads.append(request(upstream, INTERACTIVE, "interactive", granted))
+        wait_until(lambda: len(upstream._waiting) == 2)
+    for thread in threads:
+        thread.join(TIMEOUT)
+    assert granted == ["bulk", "interactive"]
+
+
+def test_class_cap_holds_back_bulk_but_not_interactive():
+    upstream = UpstreamScheduler("test", max_concurrency=4, class_caps={INTERACTIVE: 4, BACKGROUND: 1, BULK: 1})
+    granted = []
+    release = threading.Event()
+    threads = [request(upstream, BULK, "bulk 1", granted, release)]
+    wait_until(lambda: granted == ["bulk 1"])
+
+    # The API has free slots, but BULK is at its cap
+    threads.append(request(upstream, BULK, "bulk 2", granted, release))
+    wait_until(lambda: len(upstream._waiting) == 1)
+    threads.append(request(upstream, INTERACTIVE, "interactive", granted, release))
+    wait_until(lambda: "interactive" in granted)
+    assert "bulk 2" not in granted
+
+    release.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    assert granted == ["bulk 1", "interactive", "bulk 2"]
+    assert upstream._active == {INTERACTIVE: 0, BACKGROUND: 0, BULK: 0}
+
+
+def test_cancelled_while_queued():
+    upstream = UpstreamScheduler("test", max_concurrency=1, class_caps={INTERACTIVE: 1, BACKGROUND: 1, BULK: 1})
+    cancel = threading.Event()
+    with upstream.slot(INTERACTIVE):
+        threading.Timer(0.05, cancel.set).start()
+        with scheduler.cancellable(cancel), pytest.raises(scheduler.Cancelled):
+            with upstream.slot(BULK):
+                pass
+    assert upstream._waiting == []
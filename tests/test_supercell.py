@@ -0,0 +1,31 @@
+import pytest
+
+from supercell import InvalidTagError, TAG_MAX_LENGTH, TAG_MIN_LENGTH, canonicalize_tag
+
+
+def test_canonical_form():
+    assert canonicalize_tag(" #8qu8j9lp ") == "#8QU8J9LP"
+    assert canonicalize_tag("8QU 8J9 LP") == "#8QU8J9LP"
+
+
+def test_letter_o_becomes_zero():
+    assert canonicalize_tag("#2OPY") == "#20PY"
+    assert canonicalize_tag("o2py") == "#02PY"
+
+
+@pytest.mark.parametrize("raw_tag", ["", "#", "   "])
+def test_rejects_empty(raw_tag):
+    with pytest.raises(InvalidTagError):
+        canonicalize_tag(raw_tag)
+
+
+@pytest.mark.parametrize("length", [TAG_MIN_LENGTH - 1, TAG_MAX_LENGTH + 1])
+def test_rejects_bad_lengths(length):
+    with pytest.raises(InvalidTagError, match="characters long"):
+        canonicalize_tag("#" + "2" * length)
+
+
+@pytest.mark.parametrize("raw_tag", ["#8QU8J9LA", "#ABC", "#12345", "#8QU-J9LP"])
+def test_rejects_bad_characters(raw_tag):
+    with pytest.raises(InvalidTagError, match="never appear in tags"):
+        canonicalize_tag(raw_tag)
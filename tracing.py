@@ -0,0 +1,172 @@
+import collections
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================
+# SETTINGS
+# ============================
+# Every interaction is traced in memory; only sampled or slow traces are kept
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+SLOW_TRACE_SECONDS = float(os.getenv("SLOW_TRACE_SECONDS", "2.0"))
+TRACE_BUFFER_SIZE = 200
+TRACE_FILE = os.getenv("TRACE_FILE")  # JSONL export, disabled when unset
+EXPORT_QUEUE_SIZE = 1000
+
+
+# ============================
+# SPANS
+# ============================
+class Span:
+    """One timed operation inside an interaction's trace"""
+    __slots__ = ("name", "attributes", "start_time", "_start", "duration", "error", "children")
+
+    def __init__(self, name, attributes=None):
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self.children = []
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round((self.duration or 0) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+recent_traces = collections.deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+@contextmanager
+def trace(name, **attributes):
+    """Start a new trace (root span) for one interaction"""
+    root = Span(name, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except Exception as e:
+        root.error = repr(e)
+        raise
+    finally:
+        root.finish()
+        _current_span.reset(token)
+        if root.duration >= SLOW_TRACE_SECONDS or random.random() < TRACE_SAMPLE_RATE:
+            recent_traces.append(root)
+            _export(root)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a child of the current span. No-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, attributes)
+    # list.append is atomic, so spans finishing in worker threads are safe
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = repr(e)
+        raise
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def traced(func):
+    """Decorator: run a sync helper inside a span named after it"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def trace_command(command):
+    """Decorator for slash command callbacks: one trace per interaction.
+    Put it directly above the `async def`, below the app_commands decorators."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(interaction, *args, **kwargs):
+            with trace(f"/{command}", command=command, guild_id=getattr(interaction, "guild_id", None)):
+                return await func(interaction, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ============================
+# EXPORT
+# ============================
+_export_queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+_exporter = None
+dropped_traces = 0
+
+
+def _export(root):
+    """Queue a finished trace for the JSONL exporter without ever blocking"""
+    global _exporter, dropped_traces
+    if not TRACE_FILE:
+        return
+    if _exporter is None:
+        _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+        _exporter.start()
+    try:
+        _export_queue.put_nowait(root)
+    except queue.Full:
+        dropped_traces += 1
+
+
+def _export_loop():
+    while True:
+        root = _export_queue.get()
+        try:
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(root.to_dict()) + "\n")
+                # Drain whatever else is waiting in the same write
+                while not _export_queue.empty():
+                    f.write(json.dumps(_export_queue.get_nowait().to_dict()) + "\n")
+        except Exception as e:
+            print("TRACE EXPORT ERROR:", e)
+
+
+# ============================
+# SUMMARIES
+# ============================
+def slowest_traces(count=5):
+    """Return up to count of the slowest recently kept traces, slowest first"""
+    return sorted(list(recent_traces), key=lambda t: t.duration or 0, reverse=True)[:count]
+
+
+def format_trace(root):
+    """Format a trace as an indented span tree, one span per line"""
+    lines = []
+
+    def walk(node, depth):
+        error = " ❌" if node.error else ""
+        lines.append(f"{'  ' * depth}{node.name} {(node.duration or 0) * 1000:.0f}ms{error}")
+        for child in node.children:
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
@@ -0,0 +1,172 @@
+import json
+import os
+import random
+import threading
+import time
+
+# ============================
+# SETTINGS
+# ============================
+# Each watched tag is polled once no matter how many users watch it. A player
+# who is playing (trophies or battle count changed) is polled every
+# WATCH_MIN_INTERVAL; every idle poll doubles the wait, up to WATCH_MAX_INTERVAL.
+WATCH_FILE = "watches.json"
+WATCH_MIN_INTERVAL = 120  # seconds
+WATCH_MAX_INTERVAL = 3600
+WATCH_TICK_SECONDS = 15  # how often the poller looks for due tags
+WATCHES_PER_USER = 10
+MILESTONE_STEPS = {"clash_royale": 500, "brawl_stars": 1000}  # alert every this many trophies
+
+
+class _Watched:
+    """One watched tag: its subscribers, last seen stats and polling schedule"""
+    __slots__ = ("name", "trophies", "activity", "subscribers", "interval", "next_poll")
+
+    def __init__(self, name, trophies, subscribers):
+        self.name = name
+        self.trophies = trophies
+        self.activity = None  # unknown until the first poll after a restart
+        self.subscribers = subscribers  # [{"user": user ID, "channel": channel ID}, ...]
+        self.interval = WATCH_MIN_INTERVAL
+        # Spread out so a restart doesn't poll every tag in the same tick
+        self.next_poll = time.monotonic() + random.uniform(0, WATCH_MIN_INTERVAL)
+
+
+_lock = threading.Lock()
+_watched = {}  # (game, tag) → _Watched
+_dirty = False
+
+
+# ============================
+# STORAGE
+# ============================
+def load_watches():
+    """Load watches from file (once, at startup)"""
+    global _dirty
+    stored = {}
+    if os.path.exists(WATCH_FILE):
+        try:
+            with open(WATCH_FILE, 'r') as f:
+                stored = json.load(f)
+        except:
+            stored = {}
+    with _lock:
+        _watched.clear()
+        for game, tags in stored.items():
+            for tag, entry in tags.items():
+                _watched[(game, tag)] = _Watched(entry["name"], entry["trophies"], entry["subscribers"])
+        _dirty = False
+    return len(_watched)
+
+def save_watches():
+    """Save watches to file if anything changed since the last save"""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        stored = {}
+        for (game, tag), watched in _watched.items():
+            stored.setdefault(game, {})[tag] = {
+                "name": watched.name, "trophies": watched.trophies, "subscribers": watched.subscribers,
+            }
+        _dirty = False
+    tmp_path = WATCH_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(stored, f, indent=2)
+    os.replace(tmp_path, WATCH_FILE)
+
+
+# ============================
+# SUBSCRIPTIONS
+# ============================
+def user_watches(user_id):
+    """(game, tag, name) for every tag user_id watches"""
+    with _lock:
+        return [
+            (game, tag, watched.name)
+            for (game, tag), watched in _watched.items()
+            if any(s["user"] == user_id for s in watched.subscribers)
+        ]
+
+def add_watch(game, tag, entry, user_id, channel_id):
+    """Watch tag for user_id, alerting in channel_id. entry is the game module's watch_entry().
+    Returns "added", "updated" (alerts moved to channel_id) or "limit"."""
+    global _dirty
+    with _lock:
+        watched = _watched.get((game, tag))
+        subscription = None
+        if watched is not None:
+            subscription = next((s for s in watched.subscribers if s["user"] == user_id), None)
+        if subscription is not None:
+            subscription["channel"] = channel_id
+            _dirty = True
+            return "updated"
+        count = sum(1 for w in _watched.values() if any(s["user"] == user_id for s in w.subscribers))
+        if count >= WATCHES_PER_USER:
+            return "limit"
+        if watched is None:
+            watched = _watched[(game, tag)] = _Watched(entry["name"], entry["trophies"], [])
+            watched.activity = entry["activity"]
+            watched.next_poll = time.monotonic() + WATCH_MIN_INTERVAL
+        watched.subscribers.append({"user": user_id, "channel": channel_id})
+        _dirty = True
+        return "added"
+
+def remove_watch(game, tag, user_id):
+    """Stop user_id's watch on tag; the tag stops being polled once nobody watches it"""
+    global _dirty
+    with _lock:
+        watched = _watched.get((game, tag))
+        if watched is None:
+            return False
+        subscribers = [s for s in watched.subscribers if s["user"] != user_id]
+        if len(subscribers) == len(watched.subscribers):
+            return False
+        if subscribers:
+            watched.subscribers = subscribers
+        else:
+            del _watched[(game, tag)]
+        _dirty = True
+        return True
+
+
+# ============================
+# ADAPTIVE POLLING
+# ============================
+def due_tags(now=None):
+    """{game: [tag, ...]} of watched tags whose next poll is due"""
+    now = time.monotonic() if now is None else now
+    due = {}
+    with _lock:
+        for (game, tag), watched in _watched.items():
+            if watched.next_poll <= now:
+                due.setdefault(game, []).append(tag)
+    return due
+
+def observe(game, tag, entry, now=None):
+    """Record a poll result (entry is watch_entry() data, or None if the fetch failed)
+    and schedule the next poll. Returns (name, milestone, subscribers) if a milestone was
+    crossed upwards since the last poll, else None."""
+    global _dirty
+    now = time.monotonic() if now is None else now
+    with _lock:
+        watched = _watched.get((game, tag))
+        if watched is None:
+            return None
+        if entry is None or (entry["trophies"], entry["activity"]) == (watched.trophies, watched.activity):
+            # Idle (or unreachable): back off exponentially
+            watched.interval = min(watched.interval * 2, WATCH_MAX_INTERVAL)
+            watched.next_poll = now + watched.interval
+            return None
+
+        watched.interval = WATCH_MIN_INTERVAL
+        watched.next_poll = now + watched.interval
+        step = MILESTONE_STEPS[game]
+        previous = watched.trophies
+        watched.name = entry["name"]
+        watched.trophies = entry["trophies"]
+        watched.activity = entry["activity"]
+        _dirty = True
+        if entry["trophies"] // step > previous // step:
+            return watched.name, entry["trophies"] // step * step, list(watched.subscribers)
+        return None